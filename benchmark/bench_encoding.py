@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+
+import argparse
+import os, sys
+import timeit
+import numpy as np
+
+sys.path.append(os.path.realpath("."))
+
+from src.api import app
+from src.EncodeMod import JSON, encode, mimetypes
+from flask import jsonify
+
+def make_results(ntws, ntwa, nsails):
+    rng = np.random.default_rng(0)
+    return {
+        "name": "YD41",
+        "tws": np.linspace(2.0, 35.0, ntws).tolist(),
+        "twa": np.linspace(0.0, 180.0, ntwa).tolist(),
+        "sails": ["MN1 + S%d" % n for n in range(nsails)],
+        "results": rng.uniform(0.0, 10.0, (ntws, ntwa, nsails, 5)),
+    }
+
+def bench(results, repeat):
+    def current():
+        # the path of /api/vpp/ before content negotiation
+        with app.app_context():
+            return jsonify(dict(results, results=results["results"].tolist())).get_data()
+
+    cases = [("jsonify (current)", current)]
+    for mimetype in mimetypes():
+        dtypes = ["float64"] if mimetype == JSON else ["float32", "float64"]
+        for dtype in dtypes:
+            cases.append(("%s %s" % (mimetype, dtype if mimetype != JSON else ""),
+                          lambda m=mimetype, d=dtype: encode(results, m, d)))
+
+    print("%-36s %12s %12s" % ("Encoding", "Time (ms)", "Size (kB)"))
+    print("--------------------------------------------------------------")
+    for label, func in cases:
+        time = min(timeit.repeat(func, number=1, repeat=repeat))
+        print("%-36s %12.2f %12.1f" % (label, time * 1e3, len(func()) / 1024.0))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='VPP API encoding benchmark')
+    parser.add_argument('--tws', type=int, default=35, help='number of TWS')
+    parser.add_argument('--twa', type=int, default=181, help='number of TWA')
+    parser.add_argument('--sails', type=int, default=3, help='number of sail sets')
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='repetitions')
+    args = parser.parse_args()
+
+    bench(make_results(args.tws, args.twa, args.sails), args.repeat)
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+
+import argparse
+import os, sys
+import subprocess
+import time
+import numpy as np
+
+root = os.path.realpath(".")
+
+cases = {
+    "core": "import src.VPPMod",
+    "core + plotting": "import src.VPPMod, matplotlib.pyplot",
+    "api": "import src.api",
+}
+
+def time_import(code, repeat):
+    times = np.empty(repeat)
+    for i in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=root, check=True)
+        times[i] = time.perf_counter() - start
+    return times
+
+def import_profile(code, top, depth=2):
+    # cumulative time of the slowest imports down to depth, from -X importtime
+    res = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                         cwd=root, check=True, capture_output=True, text=True)
+    rows = []
+    for line in res.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        level = (len(name) - len(name.lstrip())) // 2 # 0 for top-level imports
+        if level <= depth:
+            rows.append((int(cumulative), "  " * level + name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='VPP start-up benchmark')
+    parser.add_argument('-r', '--repeat', type=int, default=10, help='repetitions')
+    parser.add_argument('-t', '--top', type=int, default=10, help='number of slowest imports listed')
+    args = parser.parse_args()
+
+    print("%-20s %10s %10s" % ("Case", "Min (ms)", "Median (ms)"))
+    print("------------------------------------------")
+    for label, code in cases.items():
+        t = time_import(code, args.repeat)
+        print("%-20s %10.1f %10.1f" % (label, 1e3 * t.min(), 1e3 * np.median(t)))
+
+    print("\nSlowest imports of %s:" % cases["core"])
+    for cumulative, name in import_profile(cases["core"], args.top):
+        print("%10.1f ms  %s" % (cumulative / 1e3, name))
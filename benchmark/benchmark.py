@@ -1,9 +1,11 @@
 #!/usr/bin/env python3
 
 import argparse
+import json
 import os, sys
+import time
 import numpy as np
-import matplotlib.pyplot as plt
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
 sys.path.append(os.path.realpath("."))
@@ -12,128 +14,137 @@ from src.YachtMod import Yacht, Keel, Rudder
 from src.SailMod import Main, Jib, Kite
 from src.VPPMod import VPP, KNOTS_TO_MPS
 
-tws = np.array([3, 4, 5, 6, 7, 8, 10]) # TWS in m/s
-data_file = "dat/YD-41/YD41.dat"
+manifest_file = "benchmark/manifest.json"
 bm_dir = "benchmark/dat/"
 
-def load_data(path, set_size = 32):
+def load_manifest(path):
+    if not os.path.exists(path):
+        print("Path not found %s" % path)
+        sys.exit(1)
+    with open(path, "r") as f:
+        return json.load(f)
+
+def load_data(path, tws, set_size = 32):
+    """
+    Reads a polar file, set_size (TWA in rad, VB in knots) rows per TWS,
+    as an array of shape (len(tws), set_size, 2).
+    """
     if not os.path.exists(path):
         print("Path not found %s" % path)
         sys.exit(1)
     dat = np.genfromtxt(path)
-    if dat.size < tws.size * set_size * 2:
+    if dat.size < len(tws) * set_size * 2:
         print("Unexpected dataset size, file %s." % path)
         sys.exit(1)
 
-    res = {key: dat[i*set_size:(i+1)*set_size] for i, key in enumerate(tws)}
-    for key in res:
-        if res[key][0, 0] > res[key][set_size - 1, 0]:
-            res[key] = res[key][::-1] # a couple of sets are reversed
+    res = dat[:len(tws) * set_size].reshape(len(tws), set_size, 2)
+    reversed = res[:, 0, 0] > res[:, -1, 0]
+    res[reversed] = res[reversed, ::-1] # a couple of sets are reversed
     return res
 
-def load_benchmarks():
-    return {f: load_data(os.path.join(bm_dir, f)) for f in os.listdir(bm_dir)}
+def history_dir(boat):
+    return boat.get("history", os.path.join(bm_dir, boat["name"]))
 
-def compute(tws_val, twa_range):
-    Keel1 = Keel(Cu=1.00, Cl=0.78, Span=1.90)
-    Rudder1 = Rudder(Cu=0.48, Cl=0.22, Span=1.15)
+def load_benchmarks(boat):
+    path = history_dir(boat)
+    if not os.path.isdir(path):
+        return {}
+    return {f: load_data(os.path.join(path, f), boat["tws"]) for f in sorted(os.listdir(path))}
 
-    YD41 = Yacht(
-        Name="YD41",
-        Lwl=11.90,
-        Vol=6.05,
-        Bwl=3.18,
-        Tc=0.4,
-        WSA=28.20,
-        Tmax=2.30,
-        Amax=1.051,
-        Mass=6500,
-        Ff=1.5,
-        Fa=1.5,
-        Boa=4.2,
-        Loa=12.5,
-        App=[Keel1, Rudder1],
-        Sails=[
-            Main(name="M1",P=16.60, E=5.60, Roach=0.1, BAD=1.0),
-            Jib(name="J1",I=16.20, J=5.10, LPG=5.40, HBI=1.8),
-            Kite(name="A2",area=150.0, vce=9.55),
-        ],
+def build_yacht(boat):
+    return Yacht(
+        **boat["yacht"],
+        App=[Keel(**boat["keel"]), Rudder(**boat["rudder"])],
+        Sails=[Main(**boat["main"]), Jib(**boat["jib"])] + [Kite(**k) for k in boat.get("kites", [])],
     )
 
-    vpp = VPP(Yacht=YD41)
-    vpp.set_analysis(np.array([tws_val]) / KNOTS_TO_MPS, twa_range / np.pi * 180.0)
-    vpp.run()
-    print(np.shape(vpp.store))
-    res = np.empty([len(twa_range), 2])
-    for i, twa in enumerate(twa_range):
-        res[i, :] = [twa , np.max(vpp.store[0, i, :, 0], axis=0)]
-    return res
+def solve(boat, tws, twa):
+    # one model for all the points, the best speed over the sail sets
+    vpp = VPP(Yacht=build_yacht(boat))
+    res = vpp.solve_points(tws.ravel(), twa.ravel())
+    return np.max(res[:, :, 0], axis=1).reshape(tws.shape)
+
+def compute(boat, ref, jobs=1):
+    """
+    Solves the boat at the TWS (m/s) and TWA (rad) of the reference polar.
+    With more than one job, the TWS are split over worker processes, each
+    building the model once.
+    """
+    twa = ref[:, :, 0]
+    tws = np.broadcast_to(np.array(boat["tws"], dtype=float)[:, None], twa.shape)
+    tws, twa_deg = tws / KNOTS_TO_MPS, np.degrees(twa)
+    if jobs > 1:
+        chunks = np.array_split(np.arange(len(tws)), min(jobs, len(tws)))
+        with ProcessPoolExecutor(len(chunks)) as pool:
+            vb = np.concatenate(list(pool.map(solve, [boat] * len(chunks),
+                                              [tws[c] for c in chunks], [twa_deg[c] for c in chunks])))
+    else:
+        vb = solve(boat, tws, twa_deg)
+    return np.stack([twa, vb], axis=-1)
 
 def vmg_stats(vb):
-    proj = np.multiply(vb[:,1], np.cos(vb[:,0]))
-    up_idx = np.argmax(proj)
-    down_idx = np.argmin(proj)
-    return {'up' : proj[up_idx], 'down': proj[down_idx], 'ang_up': vb[up_idx, 0] / np.pi * 180.0, 'ang_down': vb[down_idx, 0] / np.pi * 180.0}
+    proj = vb[..., 1] * np.cos(vb[..., 0])
+    up_idx = np.argmax(proj, axis=-1)[..., None]
+    down_idx = np.argmin(proj, axis=-1)[..., None]
+    ang = np.degrees(vb[..., 0])
+    return {'up' : np.take_along_axis(proj, up_idx, -1)[..., 0],
+            'down': np.take_along_axis(proj, down_idx, -1)[..., 0],
+            'ang_up': np.take_along_axis(ang, up_idx, -1)[..., 0],
+            'ang_down': np.take_along_axis(ang, down_idx, -1)[..., 0]}
 
-def collect_stats(bm, calc):
-    stats = {f: {} for f in bm}
+def collect_stats(bm, calc, tws):
+    stats = {}
+    calc_vmg = vmg_stats(calc)
     for f in bm:
-        table = ""
+        diff = calc[:, :, 1] - bm[f][:, :, 1]
+        bm_vmg = vmg_stats(bm[f])
         stats[f] = {
-            'std':      np.empty(len(tws)),
-            'median':   np.empty(len(tws)),
-            'mean':     np.empty(len(tws)),
-            'variance': np.empty(len(tws)),
-            'vmg_up':   np.empty(len(tws)),
-            'vmg_down': np.empty(len(tws)),
-            'ang_up':   np.empty(len(tws)),
-            'ang_down': np.empty(len(tws))
+            'std':      np.std(diff, axis=1, dtype=np.float64),
+            'median':   np.median(diff, axis=1),
+            'mean':     np.mean(diff, axis=1, dtype=np.float64),
+            'variance': np.var(diff, axis=1, dtype=np.float64),
+            'rms':      np.sqrt(np.mean(diff**2, axis=1)),
+            'vmg_up':   calc_vmg['up'] - bm_vmg['up'],
+            'vmg_down': calc_vmg['down'] - bm_vmg['down'],
+            'ang_up':   calc_vmg['ang_up'] - bm_vmg['ang_up'],
+            'ang_down': calc_vmg['ang_down'] - bm_vmg['ang_down'],
         }
-        for i, s in enumerate(tws):
-            calc_vmg = vmg_stats(calc[s])
-            diff = calc[s][:,1] - bm[f][s][:,1]
-            bm_vmg = vmg_stats(bm[f][s])
-            stats[f]['std'][i] = np.std(diff, dtype=np.float64)
-            stats[f]['median'][i] = np.median(diff)
-            stats[f]['mean'][i] = np.mean(diff, dtype=np.float64)
-            stats[f]['variance'][i] = np.var(diff, dtype=np.float64)
-            stats[f]['vmg_up'][i] = calc_vmg['up'] - bm_vmg['up']
-            stats[f]['vmg_down'][i] = calc_vmg['down'] - bm_vmg['down']
-            stats[f]['ang_up'][i] = calc_vmg['ang_up'] - bm_vmg['ang_up']
-            stats[f]['ang_down'][i] = calc_vmg['ang_down'] - bm_vmg['ang_down']
-            if stats[f]['std'][i] < 1e-3 and abs(stats[f]['mean'][i]) < 1e-3:
-                continue
-            table += "%2d\t% 2.4f\t% 2.4f\t% 2.4f\t% 2.4f\t% 2.4f\t% 2.4f\t% 2.4f\t% 2.4f\n" % (s,
+        differ = (stats[f]['std'] >= 1e-3) | (np.abs(stats[f]['mean']) >= 1e-3)
+        if not np.any(differ):
+            print("Calculation results identical with %s" % f)
+            continue
+        print("Comparison with %s:" % f)
+        print("=======================================================================")
+        print("TWS\t Std\t Median\t Mean\t Var\t VMG(u)\t VMG(d)\t ANG(u)\t ANG(d)")
+        print("-----------------------------------------------------------------------")
+        for i in np.flatnonzero(differ):
+            print("%2d\t% 2.4f\t% 2.4f\t% 2.4f\t% 2.4f\t% 2.4f\t% 2.4f\t% 2.4f\t% 2.4f" % (tws[i],
                 stats[f]['std'][i], stats[f]['median'][i],
                 stats[f]['mean'][i], stats[f]['variance'][i],
                 stats[f]['vmg_up'][i], stats[f]['vmg_down'][i],
-                stats[f]['ang_up'][i], stats[f]['ang_down'][i])
-        if not table:
-            print("Calculation results identical with %s" % f)
-        else:
-            print("Comparison with %s:" % f)
-            print("=======================================================================")
-            print("TWS\t Std\t Median\t Mean\t Var\t VMG(u)\t VMG(d)\t ANG(u)\t ANG(d)")
-            print("-----------------------------------------------------------------------")
-            print(table)
+                stats[f]['ang_up'][i], stats[f]['ang_down'][i]))
+        print()
 
     return stats
 
-def plot_polar(bm, calc, stats):
+def plot_polar(name, bm, calc, stats, tws, dpi):
+    import matplotlib.pyplot as plt
+
     print("Generating polar plots...")
+    calc_vmg = vmg_stats(calc)
     for f in bm:
-        if all(std < 1e-3 for std in stats[f]['std']):
+        if np.all(stats[f]['std'] < 1e-3):
             continue
         label = os.path.splitext(f)[0]
         for i, s in enumerate(tws):
             if (stats[f]['std'][i] < 1e-3):
                 print("Skip graph for TWS %d, %s" % (s, f))
                 continue
-            _, ax = plt.subplots(1, 1, subplot_kw=dict(polar=True), figsize=(16 / 3, 7.5))
-            twa = bm[f][s][:,0]
+            fig, ax = plt.subplots(1, 1, subplot_kw=dict(polar=True), figsize=(16 / 3, 7.5))
+            twa = bm[f][i, :, 0]
             ax.plot(
                 twa,
-                calc[s][:, 1],
+                calc[i, :, 1],
                 "k",
                 lw=1,
                 linestyle=(0, ()),
@@ -141,7 +152,7 @@ def plot_polar(bm, calc, stats):
             )
             ax.plot(
                 twa,
-                bm[f][s][:, 1],
+                bm[f][i, :, 1],
                 "k",
                 lw=1,
                 linestyle=(0, (1.1, 1.1)),
@@ -155,32 +166,34 @@ def plot_polar(bm, calc, stats):
             ax.set_ylabel(r"$V_B$ (knots)", labelpad=-40)
             ax.legend(title=r"TWS %d m/s" % s,loc=1, bbox_to_anchor=(1.05, 1.05))
 
-            calc_vmg = vmg_stats(calc[s])
             ax.text(0.8, 0.2,
-                "  vmg:%1.2f,%1.2f\n$\Delta$vmg:%1.2f,%1.2f\n$\Delta$ang:%1.2f,%1.2f\n$\sigma$:%1.2f\n$\mu_{1/2}$:%1.2f" %
-                    (calc_vmg['up'], calc_vmg['down'],
+                "  vmg:%1.2f,%1.2f\n$\\Delta$vmg:%1.2f,%1.2f\n$\\Delta$ang:%1.2f,%1.2f\n$\\sigma$:%1.2f\n$\\mu_{1/2}$:%1.2f" %
+                    (calc_vmg['up'][i], calc_vmg['down'][i],
                         stats[f]['vmg_up'][i], stats[f]['vmg_down'][i],
                         stats[f]['ang_up'][i], stats[f]['ang_down'][i],
                         stats[f]['std'][i], stats[f]['median'][i]),
                 transform=ax.transAxes, fontsize=12)
 
-            plt.tight_layout()
-            plt.savefig("Figure_%s_%02d.png" % (label, s), dpi=500)
+            fig.tight_layout()
+            fig.savefig("Figure_%s_%s_%02d.png" % (name, label, s), dpi=dpi)
+            plt.close(fig)
+
+def plot_stats(name, stats, tws, dpi):
+    import matplotlib.pyplot as plt
 
-def plot_stats(stats):
     print("Generating statistics plots...")
     for f in stats:
-        if all(std < 1e-3 for std in stats[f]['std']):
+        if np.all(stats[f]['std'] < 1e-3):
             continue
         label = os.path.splitext(f)[0]
-        _, ax = plt.subplots(1, 1, figsize=(16 / 3, 7.5))
+        fig, ax = plt.subplots(1, 1, figsize=(16 / 3, 7.5))
         ax.plot(
             tws,
             stats[f]['std'],
             "k",
             lw=1,
             linestyle=(0, ()),
-            label="$\sigma$",
+            label="$\\sigma$",
         )
         ax.plot(
             tws,
@@ -188,7 +201,7 @@ def plot_stats(stats):
             "k",
             lw=1,
             linestyle=(0, (1.1, 1.1)),
-            label="$\mu_{1/2}$",
+            label="$\\mu_{1/2}$",
         )
         ax.plot(
             tws,
@@ -209,49 +222,79 @@ def plot_stats(stats):
         ax.set_xlabel(r"TWS (m/s)")
         ax.legend(title=r"Stats",loc=1, bbox_to_anchor=(1.05, 1.05))
 
-        plt.tight_layout()
-        plt.savefig("Figure_%s_stats.png" % (label), dpi=500)
+        fig.tight_layout()
+        fig.savefig("Figure_%s_%s_stats.png" % (name, label), dpi=dpi)
+        plt.close(fig)
 
-def benchmark(args):
-    if args.purge:
-        for f in os.listdir(bm_dir):
-            os.remove(os.path.join(bm_dir, f))
-    bm = load_benchmarks()
+def benchmark_boat(boat, args):
+    tws = np.array(boat["tws"])
+    if args.purge and os.path.isdir(history_dir(boat)):
+        for f in os.listdir(history_dir(boat)):
+            os.remove(os.path.join(history_dir(boat), f))
+    bm = load_benchmarks(boat)
     gt = "GT"
-    bm[gt] = load_data(data_file)
+    bm[gt] = load_data(boat["reference"], tws)
 
     # make sure the grid is the same in all files
-    for s in tws:
-        for i, ang in enumerate(bm[gt][s][:, 0]):
-            for f in bm:
-                if f == gt:
-                    continue
-                if abs(ang - bm[f][s][i, 0]) > 1e-10:
-                    print("inconsistency found in %s, tws %d, index %d " % (f, s, i))
-                    sys.exit(1)
-    calc = {}
-    for s in tws:
-        calc[s] = compute(s, bm[gt][s][:, 0])
+    for f in bm:
+        bad = np.argwhere(np.abs(bm[f][:, :, 0] - bm[gt][:, :, 0]) > 1e-10)
+        if len(bad):
+            print("inconsistency found in %s, tws %d, index %d " % (f, tws[bad[0, 0]], bad[0, 1]))
+            sys.exit(1)
+
+    start = time.perf_counter()
+    calc = compute(boat, bm[gt], args.jobs)
+    runtime = time.perf_counter() - start
+    points = calc.shape[0] * calc.shape[1]
+    print("%s: %d points in %.2f s (%.1f points/s)" % (boat["name"], points, runtime, points / runtime))
 
     if args.save:
-        filepath = os.path.join(bm_dir, args.output)
-        output = open(filepath, "w")
-        for s in calc:
+        os.makedirs(history_dir(boat), exist_ok=True)
+        output = open(os.path.join(history_dir(boat), args.output), "w")
+        for i, s in enumerate(tws):
             output.write("# TWS %d m/s\n" % s)
-            np.savetxt(output, calc[s], fmt="%1.12f")
+            np.savetxt(output, calc[i], fmt="%1.12f")
         output.close()
 
-    stats = collect_stats(bm, calc)
+    stats = collect_stats(bm, calc, tws)
     if args.graph:
-        plot_polar(bm, calc, stats)
-        plot_stats(stats)
+        plot_polar(boat["name"], bm, calc, stats, tws, args.dpi)
+        plot_stats(boat["name"], stats, tws, args.dpi)
+
+    return {
+        "tws": tws.tolist(),
+        "points": points,
+        "jobs": args.jobs,
+        "runtime": runtime,
+        "points_per_second": points / runtime,
+        "accuracy": {f: {key: val.tolist() for key, val in stats[f].items()} for f in stats},
+    }
+
+def benchmark(args):
+    boats = load_manifest(args.manifest)
+    if args.boat:
+        boats = [boat for boat in boats if boat["name"] in args.boat]
+    report = {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "manifest": args.manifest,
+        "boats": {boat["name"]: benchmark_boat(boat, args) for boat in boats},
+    }
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+        print("Report written to %s" % args.report)
     print("Done.")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='VPP benchmark tool')
+    parser.add_argument('-m', '--manifest', default=manifest_file, help='manifest of the reference boats')
+    parser.add_argument('-b', '--boat', nargs='+', default=None, help='only benchmark these boats')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='worker processes')
     parser.add_argument('-p', '--purge', action='store_true', help='purge old benchmark files')
     parser.add_argument('-g', '--graph', action='store_true', help='generate polar graphs')
+    parser.add_argument('--dpi', type=int, default=150, help='resolution of the graphs')
     parser.add_argument('-s', '--save', action='store_true', help='save the results')
+    parser.add_argument('-r', '--report', default=None, help='write a JSON report to this file')
     parser.add_argument('-o', '--output', default="bm_" + datetime.now().strftime("%Y%m%d%H%M%S") + ".dat", help='output file name')
 
     benchmark(parser.parse_args())
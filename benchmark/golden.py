@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os, sys
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.realpath("."))
+
+from src.VPPMod import VPP, FAILED
+from benchmark import build_yacht, load_manifest, manifest_file
+
+golden_dir = "benchmark/golden/"
+variables = ["vb", "heel", "leeway"]
+tolerance = {"vb": 1e-3, "heel": 1e-2, "leeway": 1e-2}  # knots, degrees, degrees
+
+
+def solve_grid(boat, tws, twa):
+    vpp = VPP(Yacht=build_yacht(boat))
+    vpp.set_analysis(np.array(tws), np.array(twa))
+    vpp.run()
+    return vpp.store[..., :3], vpp.status
+
+
+def solve_points(boat, tws, twa):
+    vpp = VPP(Yacht=build_yacht(boat))
+    TWS, TWA = np.meshgrid(tws, twa, indexing="ij")
+    res = vpp.solve_points(TWS, TWA)
+    store = res.reshape(len(tws), len(twa), vpp.Nsails, 3)
+    # scattered points only flag failures as zeros
+    status = np.where(np.all(store == 0.0, axis=-1), FAILED, 0).astype(np.int8)
+    return store, status
+
+
+def solve_parallel(boat, tws, twa, jobs=2):
+    chunks = [c for c in np.array_split(np.array(tws), jobs) if len(c)]
+    with ProcessPoolExecutor(len(chunks)) as pool:
+        res = list(
+            pool.map(solve_grid, [boat] * len(chunks), chunks, [twa] * len(chunks))
+        )
+    return np.concatenate([r[0] for r in res]), np.concatenate([r[1] for r in res])
+
+
+modes = {"grid": solve_grid, "points": solve_points, "parallel": solve_parallel}
+
+
+def golden_file(boat):
+    return os.path.join(golden_dir, boat["name"] + ".npz")
+
+
+def update(boat):
+    tws, twa = boat["golden"]["tws"], boat["golden"]["twa"]
+    store, status = solve_grid(boat, tws, twa)
+    os.makedirs(golden_dir, exist_ok=True)
+    np.savez(golden_file(boat), tws=tws, twa=twa, store=store, status=status)
+    print("Golden polar of %s written to %s" % (boat["name"], golden_file(boat)))
+
+
+def compare(golden, store, tol):
+    """
+    Compares a store with the golden one, per variable. Points solved in the
+    golden store and not in the other one are reported as missing.
+    Returns
+    -------
+    (dict, list)
+        The summary per variable and the failing points, as
+        (i, j, n, variable, golden, value) tuples.
+    """
+    solved = golden["status"] < FAILED
+    missing = (
+        solved & np.all(store == 0.0, axis=-1) & np.any(golden["store"] != 0.0, axis=-1)
+    )
+    summary, failures = {}, []
+    for k, var in enumerate(variables):
+        diff = np.abs(store[..., k] - golden["store"][..., k])
+        fail = solved & (diff > tol[var])
+        summary[var] = {
+            "max": float(np.max(diff, initial=0.0, where=solved)),
+            "mean": float(np.mean(diff, where=solved)) if np.any(solved) else 0.0,
+            "tolerance": tol[var],
+            "failed": int(np.sum(fail)),
+        }
+        for i, j, n in np.argwhere(fail):
+            failures.append(
+                (i, j, n, var, golden["store"][i, j, n, k], store[i, j, n, k])
+            )
+    summary["missing"] = int(np.sum(missing))
+    return summary, failures
+
+
+def check(boat, mode, tol, jobs):
+    with np.load(golden_file(boat)) as data:
+        golden = {key: data[key] for key in data.files}
+    args = (boat, golden["tws"].tolist(), golden["twa"].tolist())
+    store, _ = (
+        solve_parallel(*args, jobs=jobs) if mode == "parallel" else modes[mode](*args)
+    )
+
+    summary, failures = compare(golden, store, tol)
+    print("%s, %s mode:" % (boat["name"], mode))
+    print(
+        "%-8s %12s %12s %12s %8s"
+        % ("Variable", "Max diff", "Mean diff", "Tolerance", "Failed")
+    )
+    print("------------------------------------------------------")
+    for var in variables:
+        s = summary[var]
+        print(
+            "%-8s %12.3e %12.3e %12.1e %8d"
+            % (var, s["max"], s["mean"], s["tolerance"], s["failed"])
+        )
+    if summary["missing"]:
+        print(
+            "%d point(s) solved in the golden polar are missing." % summary["missing"]
+        )
+    if failures:
+        print("\nTWS\t TWA\t Sail\t Var\t Golden\t\t Value\t\t Diff")
+        for i, j, n, var, ref, val in failures:
+            print(
+                "%4.1f\t%5.1f\t%d\t%s\t% 10.6f\t% 10.6f\t% .2e"
+                % (golden["tws"][i], golden["twa"][j], n, var, ref, val, val - ref)
+            )
+    summary["failures"] = [
+        {
+            "tws": float(golden["tws"][i]),
+            "twa": float(golden["twa"][j]),
+            "sail": int(n),
+            "variable": var,
+            "golden": float(ref),
+            "value": float(val),
+        }
+        for i, j, n, var, ref, val in failures
+    ]
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="VPP golden polar regression tool")
+    parser.add_argument(
+        "command",
+        choices=["check", "update"],
+        help="compare with, or regenerate, the golden polars",
+    )
+    parser.add_argument(
+        "-m",
+        "--manifest",
+        default=manifest_file,
+        help="manifest of the reference boats",
+    )
+    parser.add_argument(
+        "--mode",
+        choices=list(modes),
+        default="grid",
+        help="solution path compared with the golden polars",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=2,
+        help="worker processes of the parallel mode",
+    )
+    for var in variables:
+        parser.add_argument(
+            "--tol-" + var,
+            type=float,
+            default=tolerance[var],
+            help="tolerance on " + var,
+        )
+    parser.add_argument(
+        "-o", "--output", default=None, help="write the summary to this JSON file"
+    )
+    args = parser.parse_args()
+
+    boats = [boat for boat in load_manifest(args.manifest) if "golden" in boat]
+    if args.command == "update":
+        for boat in boats:
+            update(boat)
+        sys.exit(0)
+
+    tol = {var: getattr(args, "tol_" + var) for var in variables}
+    report = {boat["name"]: check(boat, args.mode, tol, args.jobs) for boat in boats}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    passed = all(not s["failures"] and not s["missing"] for s in report.values())
+    print("Passed." if passed else "Failed.")
+    sys.exit(0 if passed else 1)
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os, sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+sys.path.append(os.path.realpath("."))
+
+from src.api import YD41, app
+
+
+def make_payloads(mix, variants, n, unique, seed=0):
+    """
+    Draws n requests from a mix of grid sizes, "NTWSxNTWA", and yacht
+    variants, the displacement of the YD-41 scaled by up to +/- 10%.
+    """
+    rng = np.random.default_rng(seed)
+    masses = YD41["yacht"]["Mass"] * np.linspace(0.9, 1.1, variants)
+    payloads = []
+    for k in range(n):
+        ntws, ntwa = map(int, mix[rng.integers(len(mix))].split("x"))
+        d = json.loads(json.dumps(YD41))
+        d["yacht"]["Mass"] = float(masses[rng.integers(variants)])
+        d["tws_range"] = np.linspace(4.0, 20.0, ntws).tolist()
+        d["twa_range"] = np.linspace(40.0, 170.0, ntwa).tolist()
+        if unique:
+            # defeats the response cache
+            d["yacht"]["Name"] = "YD41-%d" % k
+        payloads.append(d)
+    return payloads
+
+
+def in_process(path):
+    def post(payload):
+        # the whole body is read and the response closed, which releases the
+        # admission slot of streamed analyses
+        with app.test_client().post(path, json=payload) as response:
+            response.get_data()
+            return response.status_code
+
+    return post
+
+
+def over_http(url):
+    def post(payload):
+        request = urllib.request.Request(
+            url,
+            data=json.dumps(payload).encode(),
+            headers={"content-type": "application/json"},
+            method="POST",
+        )
+        try:
+            with urllib.request.urlopen(request) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+        except OSError:
+            return 0  # connection error
+
+    return post
+
+
+def run(post, payloads, concurrency):
+    def timed(payload):
+        start = time.perf_counter()
+        status = post(payload)
+        return status, time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        res = list(pool.map(timed, payloads))
+    wall = time.perf_counter() - start
+
+    status = np.array([r[0] for r in res])
+    latency = np.array([r[1] for r in res])
+    ok = status == 200
+    return {
+        "requests": len(res),
+        "concurrency": concurrency,
+        "wall_time": wall,
+        "throughput": float(np.sum(ok) / wall),
+        "p50": float(np.percentile(latency, 50)),
+        "p95": float(np.percentile(latency, 95)),
+        "p99": float(np.percentile(latency, 99)),
+        "error_rate": float(1.0 - np.mean(ok)),
+        "status": {str(s): int(np.sum(status == s)) for s in np.unique(status)},
+    }
+
+
+def report(stats):
+    print(
+        "Requests      : %d (concurrency %d)"
+        % (stats["requests"], stats["concurrency"])
+    )
+    print("Wall time     : %.2f s" % stats["wall_time"])
+    print("Throughput    : %.2f polars/s" % stats["throughput"])
+    print(
+        "Latency (s)   : p50 %.3f  p95 %.3f  p99 %.3f"
+        % (stats["p50"], stats["p95"], stats["p99"])
+    )
+    print("Error rate    : %.1f %%" % (100.0 * stats["error_rate"]))
+    print("Status codes  : %s" % stats["status"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="VPP API load test")
+    parser.add_argument(
+        "-u",
+        "--url",
+        default=None,
+        help="server URL, e.g. http://127.0.0.1:8000, default is in-process",
+    )
+    parser.add_argument(
+        "-e", "--endpoint", default="/api/vpp/", help="endpoint to load"
+    )
+    parser.add_argument(
+        "-n", "--requests", type=int, default=50, help="number of requests"
+    )
+    parser.add_argument(
+        "-c", "--concurrency", type=int, default=4, help="concurrent clients"
+    )
+    parser.add_argument(
+        "-m",
+        "--mix",
+        default="2x3,4x8,8x16",
+        help="grid sizes NTWSxNTWA, drawn uniformly",
+    )
+    parser.add_argument(
+        "-v", "--variants", type=int, default=5, help="number of yacht variants"
+    )
+    parser.add_argument(
+        "--unique",
+        action="store_true",
+        help="make every request unique to bypass the cache",
+    )
+    parser.add_argument(
+        "-o", "--output", default=None, help="write the statistics to this JSON file"
+    )
+    args = parser.parse_args()
+
+    payloads = make_payloads(
+        args.mix.split(","), args.variants, args.requests, args.unique
+    )
+    post = (
+        in_process(args.endpoint)
+        if args.url is None
+        else over_http(args.url.rstrip("/") + args.endpoint)
+    )
+    stats = run(post, payloads, args.concurrency)
+    report(stats)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(stats, f, indent=2)
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os, sys
+import platform
+import subprocess
+import timeit
+from datetime import datetime
+import numpy as np
+
+sys.path.append(os.path.realpath("."))
+
+from src.AeroMod import AeroMod
+from src.HydroMod import HydroMod
+from src.UtilsMod import build_interp_func, KNOTS_TO_MPS
+from src.VPPMod import VPP
+from benchmark import build_yacht, load_manifest, manifest_file
+
+perf_dir = "benchmark/perf/"
+
+def reference_boat(name="YD41"):
+    # the yachts are those of the accuracy benchmark
+    return next(boat for boat in load_manifest(manifest_file) if boat["name"] == name)
+
+def with_mass(boat, mass):
+    return dict(boat, yacht=dict(boat["yacht"], Mass=mass))
+
+def micro_benchmarks():
+    boat = reference_boat()
+    yacht = build_yacht(boat)
+    aero, hydro = AeroMod(yacht), HydroMod(yacht)
+    vpp = VPP(Yacht=build_yacht(boat))
+    vpp.set_analysis(np.array([10.0]), np.array([60.0]))
+    kheff = build_interp_func("kheff")
+    tws = 10.0 * KNOTS_TO_MPS
+    return {
+        "AeroMod.update": lambda: aero.update(3.5, 15.0, tws, 60.0, 1.0, 2.0),
+        "HydroMod.update": lambda: hydro.update(3.5, 15.0, 3.0),
+        "VPP.resid": lambda: vpp.resid([3.5, 15.0, 3.0], 60.0, tws),
+        "interp.kheff": lambda: kheff(45.0),
+        "interp.Rr": lambda: hydro._interp_Rr((0.3, 4.0, 5.0)),
+        "interp.sail_cl": lambda: yacht.sails[1].cl(30.0),
+        "Yacht()": lambda: build_yacht(boat),
+        "VPP()": lambda: VPP(Yacht=build_yacht(boat)),
+    }
+
+def macro_benchmarks(quick):
+    tws = np.arange(4.0, 22.0, 2.0 if not quick else 8.0)
+    twa = np.linspace(30.0, 180.0, 31 if not quick else 7)
+
+    boat = reference_boat()
+
+    def polar():
+        vpp = VPP(Yacht=build_yacht(boat))
+        vpp.set_analysis(tws, twa)
+        vpp.run()
+
+    def sweep():
+        for mass in [6000.0, 6500.0, 7000.0]:
+            vpp = VPP(Yacht=build_yacht(with_mass(boat, mass)))
+            vpp.set_analysis(np.array([8.0]), np.linspace(40.0, 170.0, 7))
+            vpp.run()
+
+    def api():
+        from src.api import YD41, app, cache
+        cache.clear()
+        response = app.test_client().post("/api/vpp/", json=YD41)
+        assert response.status_code == 200
+
+    return {"YD41 polar": polar, "sweep": sweep, "API round trip": api}
+
+def measure(func, repeat, number=None):
+    if number is None:
+        # enough calls for ~0.2 s per repetition
+        number, _ = timeit.Timer(func).autorange()
+    times = np.array(timeit.repeat(func, number=number, repeat=repeat)) / number
+    return {"min": float(times.min()), "median": float(np.median(times)), "number": number}
+
+def commit_id():
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+        dirty = subprocess.call(["git", "diff", "--quiet", "HEAD", "--", "src"]) != 0
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def run(args):
+    res = {}
+    if not args.macro_only:
+        for name, func in micro_benchmarks().items():
+            res["micro/" + name] = measure(func, args.repeat)
+            print("%-28s %12.2f us" % ("micro/" + name, 1e6 * res["micro/" + name]["median"]))
+    if not args.micro_only:
+        for name, func in macro_benchmarks(args.quick).items():
+            res["macro/" + name] = measure(func, max(1, args.repeat // 2), number=1)
+            print("%-28s %12.3f s" % ("macro/" + name, res["macro/" + name]["median"]))
+
+    commit = commit_id()
+    report = {
+        "commit": commit,
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "quick": args.quick,
+        "results": res,
+    }
+    os.makedirs(perf_dir, exist_ok=True)
+    fname = os.path.join(perf_dir, args.output or commit + ".json")
+    with open(fname, "w") as f:
+        json.dump(report, f, indent=2)
+    print("Saved %s" % fname)
+
+def load(name):
+    for fname in [name, os.path.join(perf_dir, name), os.path.join(perf_dir, name + ".json")]:
+        if os.path.isfile(fname):
+            with open(fname, "r") as f:
+                return json.load(f)
+    print("No benchmark results %s" % name)
+    sys.exit(1)
+
+def compare(args):
+    base, new = load(args.base), load(args.new)
+    regressions = 0
+    print("%-28s %12s %12s %8s" % ("Benchmark", args.base[:12], args.new[:12], "Ratio"))
+    print("----------------------------------------------------------------")
+    for name in sorted(set(base["results"]) & set(new["results"])):
+        b, n = base["results"][name]["median"], new["results"][name]["median"]
+        ratio = n / b
+        flag = ""
+        if ratio > 1.0 + args.threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        elif ratio < 1.0 / (1.0 + args.threshold):
+            flag = "  faster"
+        print("%-28s %12.4g %12.4g %8.2f%s" % (name, b, n, ratio, flag))
+    if regressions:
+        print("%d regression(s) beyond %.0f %%." % (regressions, 100 * args.threshold))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='VPP performance benchmarks')
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("run", help="run the benchmarks and save them for this commit")
+    p.add_argument('-r', '--repeat', type=int, default=5, help='repetitions')
+    p.add_argument('-q', '--quick', action='store_true', help='smaller macro benchmarks')
+    p.add_argument('--micro-only', action='store_true', help='only run the micro benchmarks')
+    p.add_argument('--macro-only', action='store_true', help='only run the macro benchmarks')
+    p.add_argument('-o', '--output', default=None, help='output file name, default is the commit')
+    p.set_defaults(func=run)
+
+    p = sub.add_parser("compare", help="compare two saved results")
+    p.add_argument('base', help='commit or file of the reference results')
+    p.add_argument('new', help='commit or file of the new results')
+    p.add_argument('-t', '--threshold', type=float, default=0.1, help='relative slow-down flagged')
+    p.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    args.func(args)
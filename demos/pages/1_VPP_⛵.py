@@ -2,7 +2,7 @@ import json
 import logging
 import os
 import sys
-from typing import Any, Dict, List
+from typing import Dict, List
 
 import matplotlib.pyplot as plt
 import numpy as np
@@ -26,6 +26,10 @@ def process_yacht_specifications(
     jib: Dict,
     kite: Dict,
 ):
+    """
+    Streams the records of the VPP simulation as each point is solved, or a
+    single error record if the request is rejected.
+    """
     data = {
         "name": yacht["Name"],
         "yacht": yacht,
@@ -42,19 +46,29 @@ def process_yacht_specifications(
     json_string = json.dumps(data)
     headers = {"content-type": "application/json", "Accept-Charset": "UTF-8"}
     client = app.test_client()
-    response = client.post("/api/vpp/", data=json_string, headers=headers)
+    response = client.post(
+        "/api/vpp/stream/?progress=5", data=json_string, headers=headers, buffered=False
+    )
+
+    buffer = ""
+    with response:
+        # rejected requests get a JSON error instead of a stream
+        if response.status_code != 200:
+            yield {"type": "error", "error": response.get_json()["error"]}
+            return
+        for chunk in response.response:
+            buffer += chunk.decode("utf-8") if isinstance(chunk, bytes) else chunk
+            *lines, buffer = buffer.split("\n")
+            for line in lines:
+                if line:
+                    yield json.loads(line)
 
     logging.info("VPP simulation completed")
-    return response
 
 
-def plot_single_polar(response: Dict[str, Any]) -> plt.Figure:
-    name = response.json["name"]
-    sails = response.json["sails"]
-    twa_range = np.array(response.json["twa"])
-    tws_range = np.array(response.json["tws"])
-    results = np.array(response.json["results"])
-
+def plot_single_polar(
+    name: str, sails: List[str], twa_range, tws_range, results
+) -> plt.Figure:
     n = 1
 
     # polar plot
@@ -163,11 +177,33 @@ tws_slider = st.slider("True wind speed (TWS) range", 2.0, 25.0, (8.0, 12.0), st
 tws_range = np.arange(tws_slider[0], tws_slider[1], 2.0).tolist()
 
 if st.button("Process Specifications"):
-    with st.spinner("Running optimisation, this can take a minute or two."):
-        response = process_yacht_specifications(
-            tws_range, twa_range, yacht, keel, rudder, main, jib, kite
-        )
-        fig = plot_single_polar(response)
-        st.pyplot(fig)
+    # the polar is redrawn as the points are solved
+    progress = st.progress(0.0, text="Running optimisation.")
+    polar = st.empty()
+    for record in process_yacht_specifications(
+        tws_range, twa_range, yacht, keel, rudder, main, jib, kite
+    ):
+        if record["type"] == "start":
+            name, sails = record["name"], record["sails"]
+            tws, twa = np.array(record["tws"]), np.array(record["twa"])
+            results = np.zeros((len(tws), len(twa), len(sails), 5))
+        elif record["type"] == "point":
+            results[tuple(record["index"])][:3] = record["state"]
+        elif record["type"] == "progress":
+            progress.progress(
+                record["solved"] / record["total"],
+                text=f"Running optimisation, {record['eta']:.0f} s left.",
+            )
+            fig = plot_single_polar(name, sails, twa, tws, results)
+            polar.pyplot(fig)
+            plt.close(fig)
+        elif record["type"] == "error":
+            # rejected, or stopped by its budget, the polar is incomplete
+            progress.empty()
+            st.error(record["error"])
+            break
+    else:
+        progress.empty()
+        polar.pyplot(plot_single_polar(name, sails, twa, tws, results))
 
 footer()
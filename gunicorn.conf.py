@@ -0,0 +1,24 @@
+# gunicorn settings, see Procfile
+import gc
+import os
+
+# load the app once in the master, workers are forked from it
+preload_app = True
+
+# a single worker: the state of the jobs lives in the memory of the process
+# that queued them, polls landing on another worker would get a 404, and
+# each worker would start its own pool of job processes. Requests are served
+# concurrently by threads, the analyses run on the job pool and the
+# admission slots.
+workers = 1
+worker_class = "gthread"
+threads = int(os.environ.get("VPP_THREADS", 8))
+
+
+def on_starting(server):
+    from src.api import warm_up
+
+    warm_up()
+    # keep the warmed-up objects out of the collector, such that the workers
+    # do not write to, and copy, the pages they share with the master
+    gc.freeze()
@@ -6,6 +6,7 @@ import logging
 
 logging.basicConfig(level=logging.INFO)
 
+from src.RenderMod import render_polar, render_sail_chart
 from src.SailMod import Jib, Kite, Main
 from src.VPPMod import VPP
 from src.YachtMod import Keel, Rudder, Yacht
@@ -41,5 +42,5 @@ vpp.set_analysis(
 
 vpp.run(verbose=False)
 vpp.write("results")
-vpp.polar(3, True)
-vpp.SailChart(True)
+render_polar(vpp, "Polars.png", n=3)
+render_sail_chart(vpp, "SailChart.png")
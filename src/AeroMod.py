@@ -10,8 +10,6 @@ __email__ = "M.Lauber@soton.ac.uk"
 import numpy as np
 from scipy.interpolate import interp1d
 from scipy.optimize import fsolve
-from scipy.optimize import root
-import matplotlib.pyplot as plt
 from src.UtilsMod import build_interp_func
 
 
@@ -226,6 +224,8 @@ class AeroMod(object):
     # -- utility functions
     #
     def debbug(self):
+        import matplotlib.pyplot as plt
+
         for sail in self.yacht.sails:
             sail.debbug_coeffs()
         flat = np.linspace(0, 1, 64)
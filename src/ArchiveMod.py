@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+
+class ResultsArchive(object):
+    """
+    A directory holding the results of many VPP runs. Each store is saved as
+    a raw .npy array that is memory-mapped on load, and a JSON index keeps
+    the name, yacht fingerprint and analysis range of every run.
+    """
+
+    def __init__(self, path):
+        """
+        Opens, or creates, an archive.
+        Parameters
+        ----------
+        path
+            A string, the directory of the archive.
+        """
+        self.path = path
+        os.makedirs(self.path, exist_ok=True)
+        self.index = {}
+        if os.path.exists(self._file("index.json")):
+            with open(self._file("index.json"), "r") as json_file:
+                self.index = json.load(json_file)
+
+    def _file(self, fname):
+        return os.path.join(self.path, fname)
+
+    def _write_index(self):
+        tmp = self._file("index.json.tmp")
+        with open(tmp, "w") as json_file:
+            json.dump(self.index, json_file, ensure_ascii=False, sort_keys=True)
+        os.replace(tmp, self._file("index.json"))
+
+    def add(self, vpp):
+        """
+        Archives the results of a VPP run, replacing any previous run of the
+        same yacht over the same analysis range.
+        Parameters
+        ----------
+        vpp
+            A VPP object that has been run.
+        Returns
+        -------
+        str
+            The key of the run in the archive.
+        """
+        fingerprint = vpp.yacht.fingerprint
+        tws = vpp.tws_range.tolist()
+        twa = vpp.twa_range.tolist()
+        key = hashlib.sha1(json.dumps([fingerprint, tws, twa]).encode()).hexdigest()
+        key = key[:16]
+
+        tmp = self._file(key + ".tmp.npy")
+        np.save(tmp, np.ascontiguousarray(vpp.store, dtype=np.float64))
+        os.replace(tmp, self._file(key + ".npy"))
+
+        self.index[key] = {
+            "name": vpp.yacht.Name,
+            "fingerprint": fingerprint,
+            "tws": tws,
+            "twa": twa,
+            "sails": list(vpp.sail_name),
+        }
+        self._write_index()
+        return key
+
+    def find(self, name=None, fingerprint=None):
+        """
+        Returns the keys of the runs of a yacht name and/or fingerprint.
+        """
+        return [
+            key
+            for key, run in self.index.items()
+            if (name is None or run["name"] == name)
+            and (fingerprint is None or run["fingerprint"] == fingerprint)
+        ]
+
+    def load(self, key):
+        """
+        Loads a run without copying its store.
+        Parameters
+        ----------
+        key
+            A string, the key of the run.
+        Returns
+        -------
+        tuple
+            The index entry of the run and its read-only memory-mapped store.
+        """
+        if key not in self.index:
+            raise KeyError("No run %s in archive %s." % (key, self.path))
+        return self.index[key], np.load(self._file(key + ".npy"), mmap_mode="r")
+
+    def results(self, key):
+        """
+        Returns the dict of a run, identical to VPP.results().
+        """
+        run, store = self.load(key)
+        return {
+            "name": run["name"],
+            "tws": run["tws"],
+            "twa": run["twa"],
+            "sails": run["sails"],
+            "results": store.tolist(),
+        }
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, key):
+        return key in self.index
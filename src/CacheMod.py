@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+def request_key(data):
+    """
+    Content address of a request, the hash of its canonical JSON.
+    """
+    canonical = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class ResponseCache(object):
+    """
+    A thread-safe LRU cache with time-to-live. Concurrent misses of the same
+    key are coalesced, only the first one computes the value and the others
+    wait for it.
+    """
+
+    def __init__(self, maxsize=128, ttl=3600.0):
+        """
+        Parameters
+        ----------
+        maxsize
+            An integer, maximum number of entries.
+        ttl
+            A float, time-to-live of an entry in seconds.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.data = OrderedDict()
+        self.inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, compute):
+        """
+        Returns the value of a key, calling compute() on a miss.
+        """
+        with self._lock:
+            entry = self.data.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.data.pop(key, None)
+
+            future = self.inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self.inflight[key] = Future()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = compute()
+        except BaseException as e:
+            with self._lock:
+                del self.inflight[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self.data[key] = (time.monotonic() + self.ttl, value)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+            del self.inflight[key]
+        future.set_result(value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self.data.clear()
+
+    def __len__(self):
+        return len(self.data)
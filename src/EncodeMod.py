@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import io
+import json
+import struct
+
+import numpy as np
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
+
+JSON = "application/json"
+RAW = "application/octet-stream"
+NPZ = "application/x-npz"
+MSGPACK = "application/msgpack"
+
+DTYPES = {"float32": "<f4", "float64": "<f8"}
+
+
+def mimetypes():
+    """
+    Returns the encodings that can be served, JSON first as the default.
+    """
+    types = [JSON, RAW, NPZ]
+    if msgpack is not None:
+        types.append(MSGPACK)
+    return types
+
+
+def _header(results, dtype):
+    store = np.asarray(results["results"])
+    return {
+        "name": results["name"],
+        "tws": results["tws"],
+        "twa": results["twa"],
+        "sails": results["sails"],
+        "dtype": DTYPES[dtype],
+        "shape": list(store.shape),
+    }
+
+
+def encode(results, mimetype, dtype="float64"):
+    """
+    Encodes the dict of VPP.results() without formatting the store as text.
+    Parameters
+    ----------
+    results
+        A dict, as returned by VPP.results(), the "results" entry may be the
+        store array itself.
+    mimetype
+        A string, one of the encodings of mimetypes().
+    dtype
+        A string, "float32" or "float64", precision of the binary store.
+    Returns
+    -------
+    bytes
+        The encoded results. The raw encoding is a little-endian uint32
+        length, a JSON header and the little-endian store, in C order.
+    """
+    if dtype not in DTYPES:
+        raise ValueError("Unsupported dtype %s." % dtype)
+    if mimetype == JSON:
+        results = dict(results, results=np.asarray(results["results"]).tolist())
+        return json.dumps(results).encode()
+
+    header = _header(results, dtype)
+    store = np.ascontiguousarray(results["results"], dtype=DTYPES[dtype])
+    if mimetype == RAW:
+        head = json.dumps(header).encode()
+        return struct.pack("<I", len(head)) + head + store.tobytes()
+    if mimetype == NPZ:
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            name=header["name"],
+            tws=np.array(header["tws"]),
+            twa=np.array(header["twa"]),
+            sails=np.array(header["sails"]),
+            results=store,
+        )
+        return buffer.getvalue()
+    if mimetype == MSGPACK and msgpack is not None:
+        return msgpack.packb(dict(header, results=store.tobytes()))
+    raise ValueError("Unsupported encoding %s." % mimetype)
+
+
+def decode(data, mimetype):
+    """
+    Decodes results encoded with encode() back into the dict of VPP.results(),
+    with the store as a numpy array.
+    """
+    if mimetype == JSON:
+        results = json.loads(data)
+        results["results"] = np.array(results["results"])
+        return results
+    if mimetype == NPZ:
+        with np.load(io.BytesIO(data)) as npz:
+            return {
+                "name": str(npz["name"]),
+                "tws": npz["tws"].tolist(),
+                "twa": npz["twa"].tolist(),
+                "sails": npz["sails"].tolist(),
+                "results": npz["results"],
+            }
+    if mimetype == RAW:
+        (size,) = struct.unpack_from("<I", data)
+        header = json.loads(data[4 : 4 + size])
+        store = np.frombuffer(data, dtype=header.pop("dtype"), offset=4 + size)
+    elif mimetype == MSGPACK and msgpack is not None:
+        header = msgpack.unpackb(data)
+        store = np.frombuffer(header.pop("results"), dtype=header.pop("dtype"))
+    else:
+        raise ValueError("Unsupported encoding %s." % mimetype)
+    header["results"] = store.reshape(header.pop("shape"))
+    return header
@@ -7,10 +7,34 @@ __license__ = "GPL"
 __version__ = "1.0.1"
 __email__ = "M.Lauber@soton.ac.uk"
 
+from functools import lru_cache
+
 import numpy as np
 from scipy.interpolate import RegularGridInterpolator
 import warnings
-import matplotlib.pyplot as plt
+from src.UtilsMod import load_table
+
+
+@lru_cache(maxsize=None)
+def _resistance_surfaces():
+    """
+    Interpolation function of the ORC resistance surfaces, built once per process
+    """
+    surf = load_table("dat/ORCi_Drag_Surfaces.csv")
+    surf = surf.reshape((24, 43, 42))
+    # x is Fn := [0.,0.7], y is btr := [2.5,9], z is lvr := [3,9]
+    # we add zero Fn resistance (0.)
+    fn = np.hstack((0.0, np.linspace(0.125, 0.7, 24)))
+    btr = surf[0, 2:, 0]
+    lvr = surf[0, 1, 1:]
+    # build interpolation function for 3D data
+    data = np.zeros(((25, 41, 41)))
+    data[1:, :, :] = surf[:, 2:, 1:]
+    # extrapolate if outside range
+    # https://github.com/scipy/scipy/blob/v0.16.1/scipy/interpolate/interpolate.py#L1528
+    return RegularGridInterpolator(
+        (fn, btr, lvr), data, method="linear", bounds_error=False, fill_value=None
+    )
 
 
 class HydroMod(object):
@@ -48,21 +72,7 @@ class HydroMod(object):
         """
         Loads ORC resistance surfaces from file and build interpolation function
         """
-        surf = np.genfromtxt("dat/ORCi_Drag_Surfaces.csv", delimiter=",", skip_header=1)
-        surf = surf.reshape((24, 43, 42))
-        # x is Fn := [0.,0.7], y is btr := [2.5,9], z is lvr := [3,9]
-        # we add zero Fn resistance (0.)
-        fn = np.hstack((0.0, np.linspace(0.125, 0.7, 24)))
-        btr = surf[0, 2:, 0]
-        lvr = surf[0, 1, 1:]
-        # build interpolation function for 3D data
-        data = np.zeros(((25, 41, 41)))
-        data[1:, :, :] = surf[:, 2:, 1:]
-        # extrapolate if outside range
-        # https://github.com/scipy/scipy/blob/v0.16.1/scipy/interpolate/interpolate.py#L1528
-        self._interp_Rr = RegularGridInterpolator(
-            (fn, btr, lvr), data, method="linear", bounds_error=False, fill_value=None
-        )
+        self._interp_Rr = _resistance_surfaces()
 
     def _get_Rr(self):
         """
@@ -185,6 +195,8 @@ class HydroMod(object):
     #     return a
 
     def show_resistance(self, vb, file_name="None"):
+        import matplotlib.pyplot as plt
+
         resV, resR = np.empty_like(vb), np.empty_like(vb)
         for i, v in enumerate(vb):
             self.vb = v * 0.5144
@@ -205,6 +217,8 @@ class HydroMod(object):
         plt.show()
 
     def _test_gz(self):
+        import matplotlib.pyplot as plt
+
         phi = np.linspace(0, 40, 64)
         res = np.empty_like(phi)
         for i in range(64):
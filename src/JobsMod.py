@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+def _preload():
+    # the models are loaded once per worker process, not once per job,
+    # forked workers inherit them from a warmed-up server
+    from src.VPPMod import preload
+
+    preload()
+
+
+class JobQueue(object):
+    """
+    Runs VPP jobs in the background on a pool of worker processes, such that
+    requests only submit and poll jobs. Jobs wait in this process, cheapest
+    first, until a worker is free, such that small jobs overtake bulk ones.
+    The state of the jobs lives in this process, clients must poll the server
+    process they submitted to.
+    """
+
+    def __init__(self, solve, workers=None, keep=1000):
+        """
+        Parameters
+        ----------
+        solve
+            A picklable function solving the payload of a job.
+        workers
+            An integer, number of worker processes, default is the number of CPUs.
+        keep
+            An integer, number of finished jobs kept for their results.
+        """
+        self.solve = solve
+        self.workers = workers or int(os.environ.get("VPP_JOB_WORKERS", 0)) or None
+        self.keep = keep
+        self.jobs = OrderedDict()
+        self.waiting = []
+        self.running = 0
+        self._count = itertools.count()
+        self._executor = None
+        self._lock = threading.RLock()
+
+    @property
+    def executor(self):
+        # started on first use, such that importing the API forks nothing
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.workers, initializer=_preload)
+        return self._executor
+
+    def submit(self, *args, cost=0, limit=None):
+        """
+        Queues a job solving args and returns its id, jobs of lower cost are
+        started first. Raises Rejected if limit jobs are already in flight.
+        """
+        return self.submit_batch([(args, cost)], limit)[0]
+
+    def submit_batch(self, batch, limit=None):
+        """
+        Queues a list of (args, cost) jobs at once, or none of them if they
+        would take the jobs in flight beyond limit, and returns their ids.
+        """
+        with self._lock:
+            if limit is not None and self.queued() + len(batch) > limit:
+                raise Rejected("Too many jobs queued.")
+            ids = []
+            for args, cost in batch:
+                ids.append(uuid.uuid4().hex)
+                future = Future()
+                self.jobs[ids[-1]] = future
+                heapq.heappush(self.waiting, (cost, next(self._count), future, args))
+            self._trim()
+            self._dispatch()
+        for job_id in ids:
+            logging.info("Job %s queued." % job_id)
+        return ids
+
+    def future(self, job_id):
+        """
+        Returns the future of a job, to wait for it in this process.
+        """
+        future = self.jobs[job_id]
+        return future.future if isinstance(future, _Discarded) else future
+
+    def _dispatch(self):
+        # starts the cheapest waiting jobs on the free workers
+        while self.waiting and self.running < (self.workers or os.cpu_count()):
+            _, _, future, args = heapq.heappop(self.waiting)
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                task = self._submit(args)
+            except Exception as e:
+                future.set_exception(e)
+                continue
+            self.running += 1
+            task.add_done_callback(lambda task, f=future: self._finish(task, f))
+
+    def _submit(self, args):
+        # a worker that died (killed, crashed) breaks the whole pool, which
+        # is replaced once instead of failing every later job
+        try:
+            return self.executor.submit(self.solve, *args)
+        except BrokenProcessPool:
+            logging.warning("Job workers lost, restarting the pool.")
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            return self.executor.submit(self.solve, *args)
+
+    def _finish(self, task, future):
+        if task.cancelled():
+            future.set_exception(CancelledError())
+        elif task.exception() is not None:
+            future.set_exception(task.exception())
+        else:
+            future.set_result(task.result())
+        with self._lock:
+            self.running -= 1
+            self._dispatch()
+
+    def _trim(self):
+        finished = [key for key, future in self.jobs.items() if future.done()]
+        for key in finished[: max(0, len(finished) - self.keep)]:
+            del self.jobs[key]
+
+    def status(self, job_id):
+        """
+        Returns the status of a job, or None if the job is unknown.
+        """
+        future = self.jobs.get(job_id)
+        if future is None:
+            return None
+        if future.cancelled():
+            return CANCELLED
+        if future.done():
+            return FAILED if future.exception() is not None else DONE
+        return RUNNING if future.running() else QUEUED
+
+    def result(self, job_id):
+        """
+        Returns the results of a finished job, raises if it failed.
+        """
+        return self.jobs[job_id].result(timeout=0)
+
+    def cancel(self, job_id):
+        """
+        Cancels a queued job. Running jobs cannot be interrupted, they are
+        finished but their results are discarded.
+        """
+        future = self.jobs[job_id]
+        if not future.cancel() and not future.done():
+            with self._lock:
+                self.jobs[job_id] = _Discarded(future)
+        logging.info("Job %s cancelled." % job_id)
+        return CANCELLED
+
+    def queued(self):
+        """
+        Returns the number of jobs waiting or running.
+        """
+        return sum(not future.done() for future in list(self.jobs.values()))
+
+    def shutdown(self):
+        with self._lock:
+            for _, _, future, _ in self.waiting:
+                future.cancel()
+            self.waiting = []
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+class _Discarded(object):
+    """A running job that was cancelled, it behaves as a cancelled future."""
+
+    def __init__(self, future):
+        self.future = future
+
+    def cancelled(self):
+        return True
+
+    def done(self):
+        return self.future.done()
+
+    def running(self):
+        return False
+
+    def exception(self, timeout=None):
+        return None
+
+    def result(self, timeout=None):
+        raise CancelledError()
+
+
+class Rejected(RuntimeError):
+    """Raised when a request cannot be admitted, the server is saturated."""
+
+
+class AdmissionControl(object):
+    """
+    Bounds the number of analyses running in the request threads. Requests
+    beyond the free slots wait in a bounded queue ordered by cost, such that
+    small interactive requests overtake bulk ones.
+    """
+
+    def __init__(self, slots=2, max_waiting=16, timeout=30.0):
+        """
+        Parameters
+        ----------
+        slots
+            An integer, number of analyses running at once.
+        max_waiting
+            An integer, number of requests waiting for a slot.
+        timeout
+            A float, longest wait for a slot in seconds.
+        """
+        self.slots = slots
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self.running = 0
+        self.waiting = []
+        self._count = itertools.count()
+        self._cond = threading.Condition()
+
+    def acquire(self, cost):
+        """
+        Waits for a slot, cheapest requests first, raises Rejected if the
+        queue is full or the wait times out.
+        """
+        with self._cond:
+            if self.running < self.slots and not self.waiting:
+                self.running += 1
+                return
+            if len(self.waiting) >= self.max_waiting:
+                raise Rejected("Too many requests waiting.")
+
+            ticket = (cost, next(self._count))
+            heapq.heappush(self.waiting, ticket)
+            deadline = time.monotonic() + self.timeout
+            while self.running >= self.slots or self.waiting[0] != ticket:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0.0:
+                    self.waiting.remove(ticket)
+                    heapq.heapify(self.waiting)
+                    self._cond.notify_all()
+                    raise Rejected("Timed out waiting for a slot.")
+                self._cond.wait(remaining)
+            heapq.heappop(self.waiting)
+            self.running += 1
+            self._cond.notify_all()
+
+    def release(self):
+        with self._cond:
+            self.running -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, cost):
+        self.acquire(cost)
+        try:
+            yield
+        finally:
+            self.release()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import csv
+import itertools
+
+import numpy as np
+
+from src.PolarMod import Polar
+from src.UtilsMod import VPPResults
+
+OUTPUTS = ("target_bsp", "bsp_pct", "vmg", "target_twa", "target_vmg", "vmg_pct")
+
+
+def read_csv_chunks(fname, columns=("tws", "twa", "bsp"), chunk=65536):
+    """
+    Reads columns of a CSV file with a header line, chunk rows at a time,
+    such that files larger than the memory can be processed.
+    Parameters
+    ----------
+    fname
+        A string, name of the CSV file.
+    columns
+        A list of strings, names of the columns read.
+    chunk
+        An integer, number of rows per chunk.
+    Yields
+    ------
+    numpy.array
+        The columns of the next rows, of shape (<=chunk, len(columns)).
+    """
+    with open(fname, "r", newline="") as f:
+        header = [name.strip().lower() for name in next(csv.reader(f))]
+        missing = [c for c in columns if c.lower() not in header]
+        if missing:
+            raise ValueError("Columns %s not found in %s." % (missing, fname))
+        usecols = [header.index(c.lower()) for c in columns]
+        while True:
+            lines = list(itertools.islice(f, chunk))
+            if not lines:
+                return
+            yield np.loadtxt(lines, delimiter=",", usecols=usecols, ndmin=2)
+
+
+class PerformanceAnalysis(object):
+    """
+    Compares logged boat speeds with the targets of a polar. The upwind and
+    downwind VMG targets are tabulated once over the TWS range, such that
+    samples are evaluated with array operations only. Logs are in knots and
+    degrees, the TWA can be signed (port/starboard).
+    """
+
+    def __init__(self, polar, tws_step=0.1):
+        """
+        Parameters
+        ----------
+        polar
+            A Polar of the yacht.
+        tws_step
+            A float, TWS spacing of the VMG target tables (knots).
+        """
+        self.polar = polar
+        self.tws_table = np.append(
+            np.arange(polar.tws[0], polar.tws[-1], tws_step), polar.tws[-1]
+        )
+        self.up = polar.vmg_target(self.tws_table, upwind=True)
+        self.down = polar.vmg_target(self.tws_table, upwind=False)
+
+    @classmethod
+    def from_results(cls, results, **kwargs):
+        """
+        Builds the analysis from a VPP, a VPPResults or a results file name.
+        """
+        if isinstance(results, str):
+            results = VPPResults(results)
+        return cls(Polar.from_results(results), **kwargs)
+
+    def targets(self, tws, upwind):
+        """
+        Returns the target TWA, boat speed and VMG at the given TWS, upwind
+        where upwind is True and downwind elsewhere.
+        """
+        return tuple(
+            np.where(
+                upwind,
+                np.interp(tws, self.tws_table, up),
+                np.interp(tws, self.tws_table, down),
+            )
+            for up, down in zip(self.up, self.down)
+        )
+
+    def analyse(self, tws, twa, bsp):
+        """
+        Evaluates the performance of logged samples.
+        Parameters
+        ----------
+        tws
+            A numpy.array, TWS (knots).
+        twa
+            A numpy.array, TWA (degrees), signed or not.
+        bsp
+            A numpy.array, boat speed (knots).
+        Returns
+        -------
+        dict
+            Arrays of the polar speed, the percentage of it achieved, the VMG,
+            the target TWA and VMG, and the percentage of the target VMG.
+            The VMG are positive upwind and downwind.
+        """
+        tws = np.asarray(tws, dtype=float)
+        twa = np.abs(np.asarray(twa, dtype=float))
+        bsp = np.asarray(bsp, dtype=float)
+        upwind = twa < 90.0
+
+        target_bsp = self.polar.speed(tws, twa)
+        vmg = np.abs(bsp * np.cos(np.radians(twa)))
+        target_twa, _, target_vmg = self.targets(tws, upwind)
+        target_vmg = np.abs(target_vmg)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return {
+                "target_bsp": target_bsp,
+                "bsp_pct": 100.0 * bsp / target_bsp,
+                "vmg": vmg,
+                "target_twa": target_twa,
+                "target_vmg": target_vmg,
+                "vmg_pct": 100.0 * vmg / target_vmg,
+            }
+
+    def analyse_array(self, tws, twa, bsp, chunk=65536):
+        """
+        Evaluates large logs chunk by chunk, the temporary arrays are bounded
+        by the chunk size. Same returns as analyse().
+        """
+        n = len(tws)
+        res = {key: np.empty(n) for key in OUTPUTS}
+        for start in range(0, n, chunk):
+            sl = slice(start, min(start + chunk, n))
+            for key, val in self.analyse(tws[sl], twa[sl], bsp[sl]).items():
+                res[key][sl] = val
+        return res
+
+    def analyse_csv(self, fname, out=None, columns=("tws", "twa", "bsp"), chunk=65536):
+        """
+        Streams a CSV log through the analysis, holding one chunk in memory.
+        Parameters
+        ----------
+        fname
+            A string, name of the CSV log with a header line.
+        out
+            A string, if given the samples and their analysis are written
+            to this CSV file.
+        columns
+            A list of strings, names of the TWS, TWA and boat speed columns.
+        chunk
+            An integer, number of rows per chunk.
+        Returns
+        -------
+        dict
+            The number of samples and the mean percentages of the polar
+            speed and target VMG, over the samples where they are finite.
+        """
+        count = 0
+        sums = {"bsp_pct": [0.0, 0], "vmg_pct": [0.0, 0]}
+        f = open(out, "w") if out is not None else None
+        try:
+            if f is not None:
+                f.write(",".join(list(columns) + list(OUTPUTS)) + "\n")
+            for dat in read_csv_chunks(fname, columns, chunk):
+                res = self.analyse(dat[:, 0], dat[:, 1], dat[:, 2])
+                count += len(dat)
+                for key in sums:
+                    ok = np.isfinite(res[key])
+                    sums[key][0] += np.sum(res[key][ok])
+                    sums[key][1] += np.sum(ok)
+                if f is not None:
+                    np.savetxt(
+                        f, np.column_stack([dat] + [res[key] for key in OUTPUTS]),
+                        delimiter=",", fmt="%.6g",
+                    )
+        finally:
+            if f is not None:
+                f.close()
+        summary = {"samples": count}
+        for key, (total, n) in sums.items():
+            summary[key] = total / n if n else float("nan")
+        return summary
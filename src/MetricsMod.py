@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import bisect
+import threading
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    return "{%s}" % ",".join('%s="%s"' % (n, v) for n, v in zip(names, values))
+
+
+class Counter(object):
+    """A monotonic counter, optionally split by labels."""
+
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value=1, **labels):
+        key = tuple(str(labels[n]) for n in self.labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + value
+
+    def samples(self):
+        if not self.labels and not self.values:
+            yield self.name, 0
+        for key, value in sorted(self.values.items()):
+            yield self.name + _labels(self.labels, key), value
+
+
+class Gauge(object):
+    """
+    A value read from a function when the metrics are collected, which can
+    also expose a counter kept elsewhere.
+    """
+
+    def __init__(self, name, help, func, kind="gauge"):
+        self.name = name
+        self.help = help
+        self.func = func
+        self.kind = kind
+
+    def samples(self):
+        yield self.name, self.func()
+
+
+class Histogram(object):
+    """Cumulative histogram of observations, optionally split by labels."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, buckets, labels=()):
+        self.name = name
+        self.help = help
+        self.buckets = sorted(buckets)
+        self.labels = tuple(labels)
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[n]) for n in self.labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            # counts per bucket, overflow last, then the sum of observations
+            counts = self.values.setdefault(key, [0] * (len(self.buckets) + 2))
+            counts[i] += 1
+            counts[-1] += value
+
+    def samples(self):
+        names = self.labels + ("le",)
+        for key, counts in sorted(self.values.items()):
+            total = 0
+            for bound, count in zip(self.buckets + ["+Inf"], counts[:-1]):
+                total += count
+                yield self.name + "_bucket" + _labels(names, key + (bound,)), total
+            yield self.name + "_sum" + _labels(self.labels, key), counts[-1]
+            yield self.name + "_count" + _labels(self.labels, key), total
+
+
+class Registry(object):
+    """A collection of metrics rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append("# HELP %s %s" % (metric.name, metric.help))
+            lines.append("# TYPE %s %s" % (metric.name, metric.kind))
+            for name, value in metric.samples():
+                lines.append("%s %s" % (name, repr(float(value))))
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import numpy as np
+from scipy.interpolate import RectBivariateSpline
+
+from src.UtilsMod import KNOTS_TO_MPS
+
+VARIABLES = ("vb", "heel", "leeway")
+
+
+class Polar(object):
+    """
+    Fast lookups of the results of a VPP analysis at arbitrary conditions. A
+    bicubic spline is fitted to each variable of each sail set once, queries
+    evaluate the splines of all sail sets and return the envelope, the values
+    of the fastest sail set. TWS are in knots and TWA in degrees, queries
+    outside of the analysis range are clipped to it.
+    """
+
+    def __init__(self, tws, twa, store, sails=None, name=None):
+        """
+        Parameters
+        ----------
+        tws
+            A numpy.array, TWS of the analysis (knots).
+        twa
+            A numpy.array, TWA of the analysis (degrees).
+        store
+            A numpy.array of shape (Ntws, Ntwa, Nsails, >=3), the VPP store.
+        sails
+            A list of strings, names of the sail sets.
+        name
+            A string, name of the yacht.
+        """
+        self.tws = np.asarray(tws, dtype=float)
+        self.twa = np.asarray(twa, dtype=float)
+        store = np.asarray(store, dtype=float)[..., :3]
+        if len(self.tws) < 2 or len(self.twa) < 2:
+            raise ValueError("A polar needs at least two TWS and two TWA.")
+        self.Nsails = store.shape[2]
+        self.sails = (
+            sails if sails is not None else [str(n) for n in range(self.Nsails)]
+        )
+        self.name = name
+
+        # sail sets are only valid over the TWA range they were solved for
+        solved = np.any(store[..., 0] > 0.0, axis=0)
+        self.twa_lo = np.array(
+            [self.twa[s].min() if np.any(s) else np.inf for s in solved.T]
+        )
+        self.twa_hi = np.array(
+            [self.twa[s].max() if np.any(s) else -np.inf for s in solved.T]
+        )
+
+        # small grids get lower degree splines
+        self.kx, self.ky = min(3, len(self.tws) - 1), min(3, len(self.twa) - 1)
+        self.splines = {var: [] for var in VARIABLES}
+        for n in range(self.Nsails):
+            filled = self._fill(store[:, :, n, :], store[:, :, n, 0] > 0.0)
+            for k, var in enumerate(VARIABLES):
+                self.splines[var].append(
+                    RectBivariateSpline(
+                        self.tws, self.twa, filled[..., k], kx=self.kx, ky=self.ky
+                    )
+                )
+
+    @classmethod
+    def from_results(cls, results):
+        """
+        Builds the polar of a VPP, or VPPResults, analysis, whose TWS are
+        in m/s.
+        """
+        name = getattr(results, "name", None) or getattr(
+            getattr(results, "yacht", None), "Name", None
+        )
+        return cls(
+            np.asarray(results.tws_range) / KNOTS_TO_MPS,
+            results.twa_range,
+            results.store,
+            results.sail_name,
+            name,
+        )
+
+    def _fill(self, dat, solved):
+        # failed and skipped points are interpolated along the TWA, such that
+        # they do not pull the spline down
+        dat = dat.copy()
+        for i in range(len(self.tws)):
+            if np.any(solved[i]) and not np.all(solved[i]):
+                for k in range(dat.shape[-1]):
+                    dat[i, :, k] = np.interp(
+                        self.twa, self.twa[solved[i]], dat[i, solved[i], k]
+                    )
+        return dat
+
+    def _clip(self, tws, twa):
+        tws, twa = np.broadcast_arrays(
+            np.asarray(tws, dtype=float), np.asarray(twa, dtype=float)
+        )
+        return (
+            np.clip(tws, self.tws[0], self.tws[-1]),
+            np.clip(twa, self.twa[0], self.twa[-1]),
+        )
+
+    def _sails(self, var, tws, twa, dx=0, dy=0, h=1e-4):
+        # values of all sail sets, shape (Nsails,) + shape of the query;
+        # derivatives of orders the splines do not have are central
+        # differences of the lower order ones
+        if dx >= self.kx:
+            return (
+                self._sails(var, tws + h, twa, dx - 1, dy)
+                - self._sails(var, tws - h, twa, dx - 1, dy)
+            ) / (2 * h)
+        if dy >= self.ky:
+            return (
+                self._sails(var, tws, twa + h, dx, dy - 1)
+                - self._sails(var, tws, twa - h, dx, dy - 1)
+            ) / (2 * h)
+        return np.array(
+            [s(tws, twa, dx=dx, dy=dy, grid=False) for s in self.splines[var]]
+        )
+
+    def _best(self, tws, twa):
+        # index of the fastest valid sail set, and the speeds of all sets
+        vb = self._sails("vb", tws, twa)
+        shape = (-1,) + (1,) * twa.ndim
+        valid = (twa >= self.twa_lo.reshape(shape)) & (
+            twa <= self.twa_hi.reshape(shape)
+        )
+        return np.argmax(np.where(valid, vb, -np.inf), axis=0), vb
+
+    def best_sail(self, tws, twa):
+        """
+        Returns the index of the fastest sail set at each condition.
+        """
+        return self._best(*self._clip(tws, twa))[0]
+
+    def query(self, var, tws, twa, grad=False):
+        """
+        Interpolates a variable on the envelope of the sail sets.
+        Parameters
+        ----------
+        var
+            A string, "vb" (knots), "heel" or "leeway" (degrees).
+        tws
+            A float or numpy.array, TWS (knots).
+        twa
+            A float or numpy.array, TWA (degrees), broadcastable with tws.
+        grad
+            A logical, if True the derivatives with respect to TWS and TWA
+            of the fastest sail set are also returned.
+        Returns
+        -------
+        numpy.array or (numpy.array, numpy.array, numpy.array)
+            The values, and their derivatives per knot and per degree.
+        """
+        tws, twa = self._clip(tws, twa)
+        best, vb = self._best(tws, twa)
+        pick = lambda val: np.take_along_axis(val, best[None], 0)[0]
+        val = pick(vb if var == "vb" else self._sails(var, tws, twa))
+        if not grad:
+            return val
+        return (
+            val,
+            pick(self._sails(var, tws, twa, dx=1)),
+            pick(self._sails(var, tws, twa, dy=1)),
+        )
+
+    def speed(self, tws, twa, grad=False):
+        return self.query("vb", tws, twa, grad)
+
+    def heel(self, tws, twa, grad=False):
+        return self.query("heel", tws, twa, grad)
+
+    def leeway(self, tws, twa, grad=False):
+        return self.query("leeway", tws, twa, grad)
+
+    def vmg(self, tws, twa, grad=False):
+        """
+        Returns the velocity made good, positive upwind, and optionally its
+        derivatives with respect to TWS and TWA.
+        """
+        rad = np.radians(np.clip(twa, self.twa[0], self.twa[-1]))
+        if not grad:
+            return self.speed(tws, twa) * np.cos(rad)
+        vb, dvb_dtws, dvb_dtwa = self.speed(tws, twa, grad=True)
+        return (
+            vb * np.cos(rad),
+            dvb_dtws * np.cos(rad),
+            dvb_dtwa * np.cos(rad) - vb * np.sin(rad) * np.pi / 180.0,
+        )
+
+    def vmg_target(self, tws, upwind=True, step=1.0, iters=4):
+        """
+        Finds the target TWA maximising the upwind, or downwind, VMG.
+        Parameters
+        ----------
+        tws
+            A float or numpy.array, TWS (knots).
+        upwind
+            A logical, upwind or downwind target, default is True.
+        step
+            A float, spacing of the initial TWA search (degrees).
+        iters
+            An integer, number of Newton refinements of the TWA.
+        Returns
+        -------
+        (numpy.array, numpy.array, numpy.array)
+            The target TWA (degrees), boat speed and VMG (knots).
+        """
+        tws = np.clip(
+            np.atleast_1d(np.asarray(tws, dtype=float)), self.tws[0], self.tws[-1]
+        )
+        sign = 1.0 if upwind else -1.0
+        angles = np.arange(self.twa[0], self.twa[-1] + step, step)
+        TWS, TWA = np.meshgrid(
+            tws, np.clip(angles, self.twa[0], self.twa[-1]), indexing="ij"
+        )
+        twa = TWA[np.arange(len(tws)), np.argmax(sign * self.vmg(TWS, TWA), axis=1)]
+
+        # Newton steps on the derivative of the VMG of the fastest sail set
+        for _ in range(iters):
+            best = self.best_sail(tws, twa)[None]
+            pick = lambda var, dy: np.take_along_axis(
+                self._sails(var, tws, twa, dy=dy), best, 0
+            )[0]
+            vb, dvb, d2vb = pick("vb", 0), pick("vb", 1), pick("vb", 2)
+            c, s, r = np.cos(np.radians(twa)), np.sin(np.radians(twa)), np.pi / 180.0
+            dvmg = dvb * c - vb * s * r
+            d2vmg = d2vb * c - 2.0 * dvb * s * r - vb * c * r**2
+            twa = np.where(
+                sign * d2vmg < 0.0,
+                np.clip(
+                    twa - dvmg / np.where(d2vmg == 0.0, 1.0, d2vmg),
+                    twa - step,
+                    twa + step,
+                ),
+                twa,
+            )
+            twa = np.clip(twa, self.twa[0], self.twa[-1])
+
+        vb = self.speed(tws, twa)
+        return twa, vb, vb * np.cos(np.radians(twa))
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+from src.PolarMod import Polar
+from src.UtilsMod import KNOTS_TO_MPS
+
+ORC_TWS = np.array([6.0, 8.0, 10.0, 12.0, 14.0, 16.0, 20.0])  # knots
+
+
+def _weights(theta, legs):
+    # distance fractions of the legs, split linearly between grid angles
+    w = np.zeros(len(theta))
+    for twa, fraction in legs:
+        twa = np.clip(abs(twa), theta[0], theta[-1])
+        i = min(np.searchsorted(theta, twa, side="right") - 1, len(theta) - 2)
+        f = (twa - theta[i]) / (theta[i + 1] - theta[i])
+        w[i] += (1.0 - f) * fraction
+        w[i + 1] += f * fraction
+    return w / np.sum(w)
+
+
+def windward_leeward(theta):
+    """
+    Half the distance dead upwind and half dead downwind.
+    """
+    return _weights(theta, [(0.0, 0.5), (180.0, 0.5)])
+
+
+def circular_random(theta):
+    """
+    Legs in all directions with equal probability.
+    """
+    w = np.gradient(theta)
+    return w / np.sum(w)
+
+
+def coastal(legs):
+    """
+    Returns a course of legs, as (TWA in degrees, fraction of the distance)
+    pairs, such as [(45, 0.3), (90, 0.4), (150, 0.3)].
+    """
+    return lambda theta: _weights(theta, legs)
+
+
+COURSES = {"windward_leeward": windward_leeward, "circular_random": circular_random}
+
+
+def effective_speed(polar, tws, theta):
+    """
+    Speed made good along a course at an angle theta to the wind. Courses
+    closer to the wind than the upwind VMG target, or deeper than the
+    downwind one, are sailed at the VMG target on both tacks or gybes.
+    Parameters
+    ----------
+    polar
+        A Polar of the yacht.
+    tws
+        A numpy.array, TWS (knots).
+    theta
+        A numpy.array, angles between the course and the wind (degrees).
+    Returns
+    -------
+    numpy.array
+        The speeds (knots) of shape (len(tws), len(theta)).
+    """
+    twa_up, _, vmg_up = polar.vmg_target(tws, upwind=True)
+    twa_dn, _, vmg_dn = polar.vmg_target(tws, upwind=False)
+    TWS, THETA = np.meshgrid(tws, theta, indexing="ij")
+    cos = np.cos(np.radians(THETA))
+    with np.errstate(divide="ignore"):
+        return np.where(
+            THETA < twa_up[:, None],
+            vmg_up[:, None] / cos,
+            np.where(
+                THETA > twa_dn[:, None],
+                vmg_dn[:, None] / cos,
+                polar.speed(TWS, THETA),
+            ),
+        )
+
+
+def time_allowances(fleet, courses=None, tws=ORC_TWS, step=1.0):
+    """
+    Computes the time allowances of a fleet on standard courses, the time
+    needed to sail one nautical mile of each course at each TWS. The legs
+    are integrated over a TWA grid, such that all the courses of a boat are
+    rated with one matrix product.
+    Parameters
+    ----------
+    fleet
+        A list of dicts returned by VPP.results(), or of VPP objects.
+    courses
+        A dict of courses, functions returning the distance fractions on a
+        TWA grid, default is windward/leeward and circular random.
+    tws
+        A numpy.array, TWS of the allowances (knots), clipped to the range
+        of each polar.
+    step
+        A float, spacing of the TWA grid (degrees).
+    Returns
+    -------
+    dict
+        The names of the boats and courses, the TWS and the allowances
+        (s/nm) of shape (Nboats, Ncourses, Ntws).
+    """
+    courses = courses if courses is not None else COURSES
+    tws = np.asarray(tws, dtype=float)
+    theta = np.linspace(0.0, 180.0, int(round(180.0 / step)) + 1)
+    W = np.array([course(theta) for course in courses.values()])
+
+    names, allowances = [], np.empty((len(fleet), len(courses), len(tws)))
+    for b, results in enumerate(fleet):
+        if not isinstance(results, dict):
+            results = results.results(array=True)
+        polar = Polar(
+            np.asarray(results["tws"]) / KNOTS_TO_MPS,
+            results["twa"],
+            results["results"],
+            results["sails"],
+            results["name"],
+        )
+        names.append(results["name"])
+        allowances[b] = 3600.0 * W @ (1.0 / effective_speed(polar, tws, theta)).T
+
+    return {
+        "names": names,
+        "courses": list(courses),
+        "tws": tws.tolist(),
+        "allowances": allowances,
+    }
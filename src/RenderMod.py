@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from src.ArchiveMod import ResultsArchive
+from src.UtilsMod import (
+    KNOTS_TO_MPS,
+    VPPResults,
+    _draw_sail_chart,
+    _get_cross,
+    _get_vmg,
+    _polar,
+    cols,
+    stl,
+)
+
+
+def _figure(n):
+    # drawn on its own Agg canvas, such that batch rendering never opens a
+    # window nor touches the pyplot backend of the user
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(16 / 3 * n, 7.5))
+    FigureCanvasAgg(fig)
+    return _polar(n, fig)
+
+
+def _finish(fig, fname, size, dpi):
+    if size is not None:
+        fig.set_size_inches(size)
+    fig.tight_layout()
+    fig.savefig(fname, dpi=dpi)
+    return fname
+
+
+def render_polar(results, fname, n=1, size=None, dpi=96):
+    """
+    Renders the polars of a run to file. The lines of each variable are drawn
+    as a single line collection.
+    Parameters
+    ----------
+    results
+        A VPP or VPPResults.
+    fname
+        A string, name of the figure file.
+    n
+        An integer, number of variables plotted, default is 1 (Vb).
+    size
+        A tuple, (width, height) of the figure in inches, default is the
+        size of polar_plot.
+    dpi
+        An integer, resolution of the figure.
+    """
+    from matplotlib.collections import LineCollection
+    from matplotlib.lines import Line2D
+
+    fig, ax = _figure(n)
+    store, twa = results.store, np.radians(results.twa_range)
+    ntws, nsails = store.shape[0], store.shape[2]
+
+    segments = [[] for _ in range(n)]
+    color, width, style = [], [], []
+    vmg_pts = []
+    for i in range(ntws):
+        vmg, ids = _get_vmg(store[i], results.twa_range)
+        vmg_pts += [
+            (twa[vmg[p]], store[i, vmg[p], ids[p], 0], cols[ids[p] % 7])
+            for p in range(2)
+        ]
+        for k in range(nsails):
+            idx = _get_cross(store[i], k)
+            for j in range(n):
+                segments[j].append(
+                    np.column_stack(
+                        (twa[idx[0] : idx[1]], store[i, idx[0] : idx[1], k, j])
+                    )
+                )
+            color.append(cols[k % 7])
+            width.append(1.5 if i < 7 else 2.5)
+            style.append(stl[i % 7])
+
+    for j in range(n):
+        ax[j].add_collection(
+            LineCollection(
+                segments[j], colors=color, linewidths=width, linestyles=style
+            )
+        )
+        rmax = max((seg[:, 1].max() for seg in segments[j] if len(seg)), default=1.0)
+        ax[j].set_rmax(1.05 * rmax)
+    theta, r, c = zip(*vmg_pts)
+    ax[0].scatter(theta, r, s=16, facecolors="none", edgecolors=c, lw=1)
+
+    handles = [
+        Line2D([], [], color=cols[0], lw=1.5 if i < 7 else 2.5, linestyle=stl[i % 7])
+        for i in range(ntws)
+    ]
+    labels = [f"{tws / KNOTS_TO_MPS:.1f}" for tws in results.tws_range]
+    ax[0].legend(
+        handles, labels, title=r"TWS (knots)", loc=1, bbox_to_anchor=(1.05, 1.05)
+    )
+    return _finish(fig, fname, size, dpi)
+
+
+def render_sail_chart(results, fname, size=None, dpi=96):
+    """
+    Renders the sail chart of a run to file, same parameters as render_polar.
+    """
+    fig, ax = _figure(1)
+    _draw_sail_chart(ax[0], results)
+    return _finish(fig, fname, size, dpi)
+
+
+def _render_key(path, key, out_dir, n, size, dpi):
+    results = VPPResults.from_archive(ResultsArchive(path), key)
+    return [
+        render_polar(results, os.path.join(out_dir, key + "_polar.png"), n, size, dpi),
+        render_sail_chart(
+            results, os.path.join(out_dir, key + "_sails.png"), size, dpi
+        ),
+    ]
+
+
+def render_archive(path, out_dir, keys=None, n=1, size=None, dpi=96, workers=None):
+    """
+    Renders the polars and sail charts of archived runs on a pool of worker
+    processes, each opening the archive and memory-mapping its runs.
+    Parameters
+    ----------
+    path
+        A string, directory of the ResultsArchive.
+    out_dir
+        A string, directory of the figures, named after the keys of the runs.
+    keys
+        A list of strings, runs rendered, default is all the runs.
+    n, size, dpi
+        Options of render_polar.
+    workers
+        An integer, number of processes, 1 renders in this process.
+    Returns
+    -------
+    list
+        The names of the figure files.
+    """
+    keys = list(ResultsArchive(path).index) if keys is None else keys
+    os.makedirs(out_dir, exist_ok=True)
+    args = [(path, key, out_dir, n, size, dpi) for key in keys]
+    if workers == 1:
+        files = [_render_key(*a) for a in args]
+    else:
+        with ProcessPoolExecutor(workers) as pool:
+            files = list(pool.map(_render_key, *zip(*args))) if args else []
+    return [f for pair in files for f in pair]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Render the figures of archived VPP runs"
+    )
+    parser.add_argument("archive", help="directory of the results archive")
+    parser.add_argument(
+        "-o", "--output", default="figures", help="directory of the figures"
+    )
+    parser.add_argument(
+        "-k", "--keys", nargs="+", default=None, help="runs rendered, default is all"
+    )
+    parser.add_argument(
+        "-n", type=int, default=1, help="number of variables in the polars"
+    )
+    parser.add_argument(
+        "--size",
+        type=float,
+        nargs=2,
+        default=None,
+        help="figure width and height in inches",
+    )
+    parser.add_argument("--dpi", type=int, default=96, help="resolution of the figures")
+    parser.add_argument(
+        "-j", "--workers", type=int, default=None, help="worker processes"
+    )
+    args = parser.parse_args()
+
+    files = render_archive(
+        args.archive, args.output, args.keys, args.n, args.size, args.dpi, args.workers
+    )
+    print("Rendered %d figures to %s" % (len(files), args.output))
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from src.UtilsMod import KNOTS_TO_MPS
+
+EARTH_RADIUS = 3440.065  # nautical miles
+
+
+def distance(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance (nm) between points in degrees.
+    """
+    p1, p2 = np.radians(lat1), np.radians(lat2)
+    dp, dl = p2 - p1, np.radians(lon2 - lon1)
+    a = np.sin(dp / 2) ** 2 + np.cos(p1) * np.cos(p2) * np.sin(dl / 2) ** 2
+    return 2.0 * EARTH_RADIUS * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def bearing(lat1, lon1, lat2, lon2):
+    """
+    Initial great-circle bearing (degrees from north) between points.
+    """
+    p1, p2 = np.radians(lat1), np.radians(lat2)
+    dl = np.radians(lon2 - lon1)
+    y = np.sin(dl) * np.cos(p2)
+    x = np.cos(p1) * np.sin(p2) - np.sin(p1) * np.cos(p2) * np.cos(dl)
+    return np.degrees(np.arctan2(y, x)) % 360.0
+
+
+def advance(lat, lon, heading, dist):
+    """
+    Position after sailing dist (nm) along a rhumb line, for short steps.
+    """
+    h = np.radians(heading)
+    lat2 = lat + np.degrees(dist * np.cos(h) / EARTH_RADIUS)
+    mid = np.radians(0.5 * (lat + lat2))
+    lon2 = lon + np.degrees(dist * np.sin(h) / (EARTH_RADIUS * np.cos(mid)))
+    return lat2, lon2
+
+
+class WindField(object):
+    """
+    A gridded, time-varying wind field. The wind components are in m/s, u
+    eastward and v northward, on a regular (time, lat, lon) grid, with times
+    in hours. Queries are interpolated linearly in time and space, and
+    clipped to the grid.
+    """
+
+    def __init__(self, time, lat, lon, u, v):
+        self.time = np.asarray(time, dtype=float)
+        self.lat = np.asarray(lat, dtype=float)
+        self.lon = np.asarray(lon, dtype=float)
+        self.u = np.asarray(u, dtype=float)
+        self.v = np.asarray(v, dtype=float)
+        shape = (len(self.time), len(self.lat), len(self.lon))
+        if self.u.shape != shape or self.v.shape != shape:
+            raise ValueError(
+                "Wind components must be of shape (time, lat, lon) %s." % (shape,)
+            )
+
+    @classmethod
+    def load(cls, fname):
+        """
+        Reads a wind field from a .npz file holding time, lat, lon, u and v.
+        """
+        with np.load(fname) as data:
+            return cls(data["time"], data["lat"], data["lon"], data["u"], data["v"])
+
+    def save(self, fname):
+        np.savez(fname, time=self.time, lat=self.lat, lon=self.lon, u=self.u, v=self.v)
+
+    @staticmethod
+    def _index(grid, x):
+        # lower index and weight of the linear interpolation
+        if len(grid) == 1:
+            return np.zeros(np.shape(x), dtype=int), np.zeros(np.shape(x))
+        f = np.interp(x, grid, np.arange(len(grid)))
+        i = np.minimum(f.astype(int), len(grid) - 2)
+        return i, f - i
+
+    def at(self, t, lat, lon):
+        """
+        Returns the TWS (knots) and the direction the wind blows from
+        (degrees) at the given times and positions.
+        """
+        it, wt = self._index(self.time, t)
+        iy, wy = self._index(self.lat, lat)
+        ix, wx = self._index(self.lon, lon)
+        ny, nx = min(1, len(self.lat) - 1), min(1, len(self.lon) - 1)
+        nt = min(1, len(self.time) - 1)
+
+        u = np.zeros(np.broadcast(it, iy, ix).shape)
+        v = np.zeros_like(u)
+        for dt, ft in [(0, 1 - wt), (nt, wt)]:
+            for dy, fy in [(0, 1 - wy), (ny, wy)]:
+                for dx, fx in [(0, 1 - wx), (nx, wx)]:
+                    w = ft * fy * fx
+                    u += w * self.u[it + dt, iy + dy, ix + dx]
+                    v += w * self.v[it + dt, iy + dy, ix + dx]
+        tws = np.hypot(u, v) / KNOTS_TO_MPS
+        twd = np.degrees(np.arctan2(-u, -v)) % 360.0
+        return tws, twd
+
+
+class Router(object):
+    """
+    Isochrone routing of a yacht through a wind field. At each time step,
+    every point of the isochrone sails a fan of headings around the bearing
+    to the destination. The new points are pruned to the farthest one from
+    the start in each sector of bearing.
+    """
+
+    def __init__(self, polar, wind, dt=1.0, fan=120.0, step=5.0, sector=1.0):
+        """
+        Parameters
+        ----------
+        polar
+            A Polar of the yacht.
+        wind
+            A WindField.
+        dt
+            A float, time step (hours).
+        fan
+            A float, largest heading from the bearing to the destination (degrees).
+        step
+            A float, heading spacing in the fan (degrees).
+        sector
+            A float, width of the pruning sectors (degrees).
+        """
+        self.polar = polar
+        self.wind = wind
+        self.dt = dt
+        self.headings = np.arange(-fan, fan + 0.5 * step, step)
+        self.sector = sector
+
+    def speed(self, t, lat, lon, heading):
+        """
+        Boat speed (knots) and the wind at the given headings, zero when
+        sailing closer to the wind than the polar.
+        """
+        tws, twd = self.wind.at(t, lat, lon)
+        twa = np.abs((heading - twd + 180.0) % 360.0 - 180.0)
+        bsp = np.where(twa < self.polar.twa[0], 0.0, self.polar.speed(tws, twa))
+        return bsp, tws, twa
+
+    def _prune(self, lat, lon, start):
+        d = distance(start[0], start[1], lat, lon)
+        b = np.floor(bearing(start[0], start[1], lat, lon) / self.sector).astype(int)
+        order = np.lexsort((-d, b))
+        _, first = np.unique(b[order], return_index=True)
+        return order[first]
+
+    def _passed(self, lat, lon, start, end):
+        # the isochrone is beyond the destination in its sector, the last
+        # leg is sailed at the best VMG towards it
+        n = 360.0 / self.sector
+        sector = np.floor(bearing(start[0], start[1], lat, lon) / self.sector)
+        target = np.floor(bearing(start[0], start[1], end[0], end[1]) / self.sector)
+        near = np.abs((sector - target + n / 2) % n - n / 2) <= 1
+        beyond = distance(start[0], start[1], lat, lon) >= distance(
+            start[0], start[1], end[0], end[1]
+        )
+        return np.any(beyond & near)
+
+    def route(self, start, end, t0=0.0, max_hours=720.0):
+        """
+        Finds the fastest route between two positions.
+        Parameters
+        ----------
+        start
+            A tuple, (lat, lon) of the departure (degrees).
+        end
+            A tuple, (lat, lon) of the destination (degrees).
+        t0
+            A float, departure time in the wind field (hours).
+        max_hours
+            A float, longest routing time (hours).
+        Returns
+        -------
+        dict
+            The ETA (hours after departure, None if not reached) and, along
+            the route, the times, positions, headings, TWS, TWA and boat speeds.
+        """
+        lat, lon = np.array([start[0]], dtype=float), np.array([start[1]], dtype=float)
+        steps = [
+            (
+                lat,
+                lon,
+                np.zeros(1, dtype=int),
+                np.zeros(1),
+                np.zeros(1),
+                np.zeros(1),
+                np.zeros(1),
+            )
+        ]
+        eta, last, final = None, None, None
+        for k in range(int(np.ceil(max_hours / self.dt))):
+            t = t0 + k * self.dt
+
+            # fan of headings from every point of the isochrone
+            direct = bearing(lat, lon, end[0], end[1])
+            heading = (direct[:, None] + self.headings[None, :]) % 360.0
+            P = np.broadcast_to(np.arange(len(lat))[:, None], heading.shape).ravel()
+            heading = heading.ravel()
+            bsp, tws, twa = self.speed(t, lat[P], lon[P], heading)
+
+            # arrival within this step, or once the destination is passed, at
+            # the best VMG towards it
+            made_good = bsp.reshape(len(lat), -1) * np.cos(np.radians(self.headings))
+            vmg = np.max(made_good, axis=1)
+            togo = distance(lat, lon, end[0], end[1])
+            with np.errstate(divide="ignore"):
+                arrival = np.where(vmg > 0.0, togo / vmg, np.inf)
+            if np.min(arrival) <= self.dt or self._passed(lat, lon, start, end):
+                last = int(np.argmin(arrival))
+                eta = k * self.dt + arrival[last]
+                # the last leg is made good along the bearing to the
+                # destination, sailed at the TWA of the best VMG
+                h = last * len(self.headings) + np.argmax(made_good[last])
+                final = (direct[last], tws[h], twa[h], vmg[last])
+                break
+
+            new_lat, new_lon = advance(lat[P], lon[P], heading, bsp * self.dt)
+
+            keep = self._prune(new_lat, new_lon, start)
+            keep = keep[bsp[keep] > 0.0]
+            if len(keep) == 0:
+                break
+            lat, lon = new_lat[keep], new_lon[keep]
+            steps.append(
+                (lat, lon, P[keep], heading[keep], tws[keep], twa[keep], bsp[keep])
+            )
+
+        if last is None:
+            last = int(np.argmin(distance(lat, lon, end[0], end[1])))
+        return self._trace(steps, last, t0, eta, end, final)
+
+    def _trace(self, steps, last, t0, eta, end, final):
+        # walks the parents back from the last point to the start
+        path, i = [], last
+        for k in range(len(steps) - 1, -1, -1):
+            path.append([float(val[i]) for val in steps[k][:2] + steps[k][3:]])
+            i = steps[k][2][i]
+        if eta is not None:
+            path = path[::-1] + [[end[0], end[1]] + [float(val) for val in final]]
+        else:
+            path = path[::-1]
+        lat, lon, heading, tws, twa, bsp = (list(col) for col in zip(*path))
+        time = [t0 + k * self.dt for k in range(len(path))]
+        if eta is not None:
+            time[-1] = t0 + eta
+        return {
+            "eta": None if eta is None else float(eta),
+            "time": time,
+            "lat": lat,
+            "lon": lon,
+            # legs sailed to each point, the start has none; the heading and
+            # speed of the last leg are the bearing and VMG to the destination
+            "heading": heading[1:],
+            "tws": tws[1:],
+            "twa": twa[1:],
+            "bsp": bsp[1:],
+        }
+
+
+def _route_file(polar, fname, start, end, kwargs):
+    return Router(polar, WindField.load(fname), **kwargs).route(start, end)
+
+
+def route_ensemble(polar, fnames, start, end, workers=None, **kwargs):
+    """
+    Routes the yacht through each member of a wind ensemble, one file per
+    member, on a pool of worker processes.
+    Parameters
+    ----------
+    polar
+        A Polar of the yacht.
+    fnames
+        A list of strings, wind field files of the members.
+    start, end
+        Tuples, (lat, lon) of the departure and destination (degrees).
+    workers
+        An integer, number of processes, 1 routes in this process.
+    kwargs
+        Options of the Router.
+    Returns
+    -------
+    list
+        The routes of the members.
+    """
+    n = len(fnames)
+    if workers == 1:
+        return [_route_file(polar, f, start, end, kwargs) for f in fnames]
+    with ProcessPoolExecutor(workers) as pool:
+        return list(
+            pool.map(
+                _route_file, [polar] * n, fnames, [start] * n, [end] * n, [kwargs] * n
+            )
+        )
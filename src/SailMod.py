@@ -8,8 +8,8 @@ __version__ = "1.0.1"
 __email__ = "M.Lauber@soton.ac.uk"
 
 import numpy as np
-import matplotlib.pyplot as plt
 from scipy import interpolate
+from src.UtilsMod import load_table
 
 
 class Sail(object):
@@ -29,7 +29,7 @@ class Sail(object):
         """
         build interpolation function and returns it in a list
         """
-        a = np.genfromtxt("dat/" + fname + ".dat", delimiter=",", skip_header=1)
+        a = load_table("dat/" + fname + ".dat")
         self.kp = a[0, 0]
         # linear for now, this is not good, might need to polish data outside
         self.interp_cd = interpolate.interp1d(a[1, :], a[2, :], kind="linear")
@@ -44,6 +44,8 @@ class Sail(object):
         return self.interp_cd(awa)
 
     def debbug_coeffs(self, N=256):
+        import matplotlib.pyplot as plt
+
         awa = np.linspace(0, 180, N)
         coeffs = np.empty((N, 2))
         for i, a in enumerate(awa):
@@ -2,8 +2,8 @@
 # -*- coding: utf-8 -*-
 
 import json
+from functools import lru_cache
 
-import matplotlib.pyplot as plt
 import numpy as np
 from scipy import interpolate
 
@@ -37,17 +37,38 @@ def json_write(data, fname):
         json.dump(data, json_file, ensure_ascii=False, indent=2, sort_keys=False)
 
 
+@lru_cache(maxsize=None)
+def load_table(fname):
+    """
+    Reads a data table once per process, the array is shared and read-only.
+    """
+    a = np.genfromtxt(fname, delimiter=",", skip_header=1)
+    a.flags.writeable = False
+    return a
+
+
+@lru_cache(maxsize=None)
 def build_interp_func(fname, i=1, kind="linear"):
     """
     build interpolatison function and returns it in a list
     """
-    a = np.genfromtxt("dat/" + fname + ".dat", delimiter=",", skip_header=1)
+    a = load_table("dat/" + fname + ".dat")
     # linear for now, this is not good, might need to polish data outside
     return interpolate.interp1d(a[0, :], a[i, :], kind=kind, fill_value="extrapolate")
 
 
-def _polar(n) -> plt.Figure:
-    fig, ax = plt.subplots(1, n, subplot_kw=dict(polar=True), figsize=(16 / 3 * n, 7.5))
+def _pyplot():
+    # plotting is optional, matplotlib is only loaded on first use
+    import matplotlib.pyplot as plt
+
+    return plt
+
+
+def _polar(n, fig=None) -> "plt.Figure":
+    # on a new pyplot figure, unless a figure is given
+    if fig is None:
+        fig = _pyplot().figure(figsize=(16 / 3 * n, 7.5))
+    ax = fig.subplots(1, n, subplot_kw=dict(polar=True))
     # allows to simplify polar plot function
     if n == 1:
         ax = np.array([ax], dtype=object)
@@ -118,6 +139,7 @@ def polar_plot(VPP_list, n, save, fname="Polars.png") -> None:
 
     """
     # if we just want the velocity, we also output the gradient
+    plt = _pyplot()
     fig, ax = _polar(n)
     for l, VPP in enumerate(VPP_list):
         wind = VPP.twa_range
@@ -159,37 +181,9 @@ def polar_plot(VPP_list, n, save, fname="Polars.png") -> None:
 
 
 def sail_chart(VPP, save, fname="SailChart.png"):
-    sailset = _get_best_sails(VPP.store)
-
-    twa = VPP.twa_range
-    tws = VPP.tws_range
-    twas = np.hstack((twa[0] - (twa[1] - twa[0]), twa, twa[-1] + (twa[-1] - twa[-2])))
-    twss = np.hstack((tws[0] - (tws[1] - tws[0]), tws, tws[-1] + (tws[-1] - tws[-2])))
-    xnew = np.linspace(twas[0], twas[-1], 101)
-    ynew = np.linspace(twss[0], twss[-1], 51)
-
+    plt = _pyplot()
     fig, ax = _polar(1)
-    ax[0].set_ylabel(r"TWS (Knots)", labelpad=-60)
-    h = []
-    ntws, ntwa, _, _ = VPP.store.shape
-    for id in range(VPP.Nsails):
-        sail = np.zeros((ntws + 2, ntwa + 2))
-        for i in range(ntws):
-            for j in range(ntwa):
-                if sailset[i, j] == id:
-                    sail[i + 1, j + 1] = 1.0
-        func = interpolate.interp2d(twas, twss, sail, kind="cubic")
-        data = func(xnew, ynew)
-        data = np.where(data > 1.0, 1.0, data)
-        ax[0].contour(
-            np.radians(xnew), ynew, data, levels=[0.4], colors=cols[id], alpha=0.8
-        )
-        c = ax[0].contourf(
-            np.radians(xnew), ynew, data, levels=[0.4, 1.0], colors=cols[id], alpha=0.5
-        )
-        h1, _ = c.legend_elements()
-        h.append(h1[0])
-    ax[0].legend(h, VPP.sail_name, title=r"Sail Set", loc=1, bbox_to_anchor=(1.05, 0.7))
+    _draw_sail_chart(ax[0], VPP)
     plt.tight_layout()
     if save:
         plt.savefig(fname, dpi=96)
@@ -197,12 +191,98 @@ def sail_chart(VPP, save, fname="SailChart.png"):
         plt.show()
 
 
+def _draw_sail_chart(ax, VPP):
+    from matplotlib.patches import Rectangle
+
+    tws = VPP.tws_range / KNOTS_TO_MPS
+    lo, hi = sail_regions(VPP.twa_range, VPP.store)
+    ax.set_ylabel(r"TWS (Knots)", labelpad=-60)
+    h = []
+    for n in range(VPP.Nsails):
+        # one patch per run of TWS where the sail set is the fastest
+        rows = np.flatnonzero(np.isfinite(lo[n]))
+        for run in np.split(rows, np.flatnonzero(np.diff(rows) > 1) + 1):
+            if len(run) == 0:
+                continue
+            theta, r = _region_outline(tws[run], lo[n, run], hi[n, run])
+            ax.fill(theta, r, color=cols[n % 7], alpha=0.5, lw=1.0)
+            ax.plot(theta, r, color=cols[n % 7], alpha=0.8, lw=1.0)
+        h.append(Rectangle((0, 0), 1, 1, color=cols[n % 7], alpha=0.5))
+    ax.legend(h, VPP.sail_name, title=r"Sail Set", loc=1, bbox_to_anchor=(1.05, 0.7))
+
+
+def _region_outline(tws, lo, hi, n=16):
+    # outline of a sail set region, arcs at constant TWS and the crossovers
+    # in between, in polar coordinates
+    theta = np.concatenate(
+        (np.linspace(lo[0], hi[0], n), hi, np.linspace(hi[-1], lo[-1], n), lo[::-1])
+    )
+    r = np.concatenate((np.full(n, tws[0]), tws, np.full(n, tws[-1]), tws[::-1]))
+    return np.radians(theta), r
+
+
 def _get_best_sails(store):
-    res = np.zeros(store.shape[:2])
-    for i in range(store.shape[0]):
-        for j in range(store.shape[1]):
-            res[i, j] = store[i, j, :, 0].argmax()
-    return res
+    return np.argmax(store[..., 0], axis=-1)
+
+
+def sail_crossovers(twa, store):
+    """
+    Finds the TWA where the fastest sail set changes, at each TWS, as the root
+    of the difference of the speeds of the two sail sets, linearly interpolated
+    between the analysed TWA. A sail set that was not solved at one end of an
+    interval, i.e. skipped, takes over where it is first solved.
+    Parameters
+    ----------
+    twa
+        A numpy.array, TWA of the analysis (degrees).
+    store
+        A numpy.array, the VPP store.
+    Returns
+    -------
+    (numpy.array, numpy.array)
+        The fastest sail set at each point, of shape (Ntws, Ntwa), and the
+        crossover TWA between consecutive TWA, of shape (Ntws, Ntwa - 1),
+        NaN where the sail set does not change.
+    """
+    vb = store[..., 0]
+    best = _get_best_sails(store)
+    a, b = best[:, :-1, None], best[:, 1:, None]
+    va0 = np.take_along_axis(vb[:, :-1], a, -1)[..., 0]
+    vb0 = np.take_along_axis(vb[:, :-1], b, -1)[..., 0]
+    va1 = np.take_along_axis(vb[:, 1:], a, -1)[..., 0]
+    vb1 = np.take_along_axis(vb[:, 1:], b, -1)[..., 0]
+
+    d0, d1 = va0 - vb0, va1 - vb1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.where(vb0 == 0.0, 1.0, np.where(va1 == 0.0, 0.0, d0 / (d0 - d1)))
+    t = np.clip(np.nan_to_num(t, nan=0.5), 0.0, 1.0)
+    cross = twa[:-1] + t * np.diff(twa)
+    return best, np.where(a[..., 0] != b[..., 0], cross, np.nan)
+
+
+def sail_regions(twa, store):
+    """
+    Returns the TWA range over which each sail set is the fastest, at each
+    TWS, bounded by the crossovers. A sail set fastest over disjoint ranges
+    gets their envelope.
+    Returns
+    -------
+    (numpy.array, numpy.array)
+        The lower and upper TWA (degrees), of shape (Nsails, Ntws), NaN
+        where the sail set is never the fastest.
+    """
+    best, cross = sail_crossovers(twa, store)
+    # edges of the TWA intervals around each analysed TWA
+    edges = np.empty((best.shape[0], best.shape[1] + 1))
+    edges[:, 0], edges[:, -1] = twa[0], twa[-1]
+    edges[:, 1:-1] = np.where(np.isnan(cross), 0.5 * (twa[:-1] + twa[1:]), cross)
+
+    n = np.arange(store.shape[2])[:, None, None]
+    mask = best[None] == n
+    lo = np.where(mask, edges[None, :, :-1], np.inf).min(axis=-1)
+    hi = np.where(mask, edges[None, :, 1:], -np.inf).max(axis=-1)
+    found = np.any(mask, axis=-1)
+    return np.where(found, lo, np.nan), np.where(found, hi, np.nan)
 
 
 class VPPResults(object):
@@ -212,8 +292,34 @@ class VPPResults(object):
             self.fname = arg
         self._load_data()
 
+    @classmethod
+    def from_archive(cls, archive, key):
+        """
+        Loads a run from a ResultsArchive, the store is memory-mapped.
+        """
+        self = cls.__new__(cls)
+        run, self.store = archive.load(key)
+        self.fname = key
+        self.data = run
+        self.name = run["name"]
+        self.tws_range = np.array(run["tws"])
+        self.twa_range = np.array(run["twa"])
+        self.sail_name = run["sails"]
+        self.Nsails = len(self.sail_name)
+        return self
+
     def _load_data(self):
         self.data = json_read(self.fname)
+        if isinstance(self.data, dict):
+            # written by VPP.write()
+            self.name = self.data["name"]
+            self.tws_range = np.array(self.data["tws"])
+            self.twa_range = np.array(self.data["twa"])
+            self.sail_name = self.data["sails"]
+            self.Nsails = len(self.sail_name)
+            self.store = np.array(self.data["results"], dtype=np.float64)
+            return
+
         k = 1
         self.name = self.data[0]["name"]
         self.tws_range = np.array(self.data[0]["tws"])
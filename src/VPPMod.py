@@ -7,22 +7,68 @@ __license__ = "GPL"
 __version__ = "1.0.1"
 __email__ = "M.Lauber@soton.ac.uk"
 
+import json
 import logging
+import os
+import time
 import warnings
+import zipfile
 
-import nlopt
 import numpy as np
 from scipy.optimize import root
-from tqdm import trange
 
 from src.AeroMod import AeroMod
-from src.HydroMod import HydroMod
-from src.UtilsMod import KNOTS_TO_MPS, json_write, polar_plot, sail_chart
+from src.HydroMod import HydroMod, _resistance_surfaces
+from src.UtilsMod import (
+    KNOTS_TO_MPS,
+    build_interp_func,
+    json_write,
+    load_table,
+    polar_plot,
+    sail_chart,
+)
 from src.YachtMod import Yacht as YachtClass
 
 logger = logging.getLogger(__name__)
 debug_mode = logging.getLogger().getEffectiveLevel() == logging.DEBUG
 
+# convergence status of each (tws, twa, sail) point, see VPP.status
+UNSOLVED = -1
+CONVERGED = 0
+WARM_START = 1
+PERTURBED = 2
+BACKEND = 3
+FAILED = 4
+SKIPPED = 5
+
+
+def _range(n):
+    # progress bars only when debugging, tqdm is then loaded on first use
+    if not debug_mode:
+        return range(n)
+    from tqdm import trange
+
+    return trange(n)
+
+
+def preload():
+    """
+    Loads and precomputes all the static data tables and interpolation
+    functions, such that the models built afterwards, including in
+    forked processes, share them.
+    """
+    for fname in ["fcdmult", "kheff", "rrk"]:
+        build_interp_func(fname)
+    build_interp_func("rrk", i=2)
+    for sail in ["main", "jib", "kite"]:
+        load_table("dat/" + sail + ".dat")
+    _resistance_surfaces()
+    YachtClass._build_rm_interp()
+
+
+class BudgetExceeded(RuntimeError):
+    """Raised when an analysis exceeds its time or evaluation budget."""
+
 
 class VPP(object):
     """A VPP Class that run an analysis on a given Yacht."""
@@ -43,6 +89,25 @@ class VPP(object):
         # maximum allows heel angle
         self.phi_max = 35.0
 
+        # retry ladder for points that do not converge, each stage
+        # is capped at max_nfev evaluations of the residuals
+        self.max_nfev = 400
+        self.n_perturb = 3
+        self.backend = "hybr"
+        # largest force/moment imbalance (N, Nm) accepted as equilibrium
+        self.res_tol = 1.0
+
+        # budgets of a whole analysis, in seconds and residual evaluations
+        self.time_budget = None
+        self.nfev_budget = None
+
+        # equilibrium of the points queried with solve_points, cleared once
+        # memo_size points are stored, and the converged (tws, twa) and
+        # states of each sail set to warm-start the next queries from
+        self.memo_size = 10000
+        self._memo = {}
+        self._solved = {}
+
         # debbuging flag
         self.debbug = False
         if not self.debbug:
@@ -50,7 +115,7 @@ class VPP(object):
                 "ignore", "The iteration is not making good progress"
             )
 
-    def set_analysis(self, tws_range, twa_range):
+    def set_analysis(self, tws_range, twa_range, fname=None, chunk=1024):
         """
         Sets the analysis range.
         Parameters
@@ -59,6 +124,12 @@ class VPP(object):
             A numpy.array with the different TWS to run the analysis at.
         twa_range
             A numpy.array with the different TWA to run the analysis at.
+        fname
+            A string, if given the store is a memory-mapped .npy file, such
+            that memory stays bounded for very large grids, default is None.
+        chunk
+            An integer, number of solved points held in memory between two
+            writes to the memory-mapped store.
         """
 
         if tws_range.max() <= 35.0 and tws_range.min() >= 2.0:
@@ -76,10 +147,34 @@ class VPP(object):
             )
 
         # prepare storage array
+        self._set_sails()
+        shape = (len(self.tws_range), len(self.twa_range), self.Nsails, 5)
+        if fname is None:
+            self.store = np.zeros(shape)
+        else:
+            # zero-filled on creation, the solved points are written through
+            # short-lived views such that this map stays out of memory
+            self.store = np.lib.format.open_memmap(
+                fname, mode="w+", dtype=np.float64, shape=shape
+            )
+        self.fname = fname
+        self.chunk = chunk
+        # points solved since the last write to a memory-mapped store
+        self._pending = {}
+        # convergence status and number of residual evaluations per point
+        self.status = np.full(self.store.shape[:3], UNSOLVED, dtype=np.int8)
+        self.nfev = np.zeros(self.store.shape[:3], dtype=np.int32)
+        # (tws, twa, sail) index of the last point solved
+        self.cursor = (-1, -1, -1)
+
+        # minimzation bounds
+        self.bnds = ((0, None), (0.0, self.phi_max), (-2.0, 6.0), (0.62, 1.0), (0, 2.0))
+
+        # flag for later
+        self.upToDate = True
+
+    def _set_sails(self):
         self.Nsails = len(self.yacht.sails) - 1  # main not counted
-        self.store = np.zeros(
-            (len(self.tws_range), len(self.twa_range), self.Nsails, 5)
-        )
         self.sail_name = [
             self.yacht.sails[0].name + " + " + self.yacht.sails[n + 1].name
             for n in range(self.Nsails)
@@ -89,11 +184,38 @@ class VPP(object):
         self.lim_up = 60.0
         self.lim_dn = 135.0 if (self.Nsails != 1) else 200.0
 
-        # minimzation bounds
-        self.bnds = ((0, None), (0.0, self.phi_max), (-2.0, 6.0), (0.62, 1.0), (0, 2.0))
+    def count_points(self):
+        """
+        Returns the number of points solved by the analysis, skipped excluded.
+        """
+        n = 0
+        for sail in self.yacht.sails[1:]:
+            if sail.up:
+                n += np.sum(self.twa_range < self.lim_dn)
+            else:
+                n += np.sum(self.twa_range > self.lim_up)
+        return int(len(self.tws_range) * n)
+
+    def _use_sails(self, n):
+        self.aero.sails[1] = self.yacht.sails[n + 1]
+
+        logging.debug(
+            "Sail Config : ",
+            self.aero.sails[0].name + " + " + self.aero.sails[1].name,
+        )
 
-        # flag for later
-        self.upToDate = True
+        self.aero.up = self.aero.sails[1].up
+
+    def _skip(self, twa):
+        # don't do low twa with downwind sails
+        if (self.aero.up == True) and (twa >= self.lim_dn):
+            return True
+        return (self.aero.up == False) and (twa <= self.lim_up)
+
+    @staticmethod
+    def _initial_guess(tws, twa):
+        leeway0 = 100.0 / twa if (twa > 1.0 and 100.0 / twa < 2 * tws) else 2 * tws
+        return [0.8 * tws, 0, leeway0]
 
     def Vb(self, x, grad):
         # this should not be used
@@ -122,6 +244,8 @@ class VPP(object):
         return None
 
     def run_NLopt(self, verbose=False):
+        import nlopt
+
         logging.info("Optimisation start")
 
         if not self.upToDate:
@@ -154,7 +278,7 @@ class VPP(object):
 
                 self.aero.up = self.aero.sails[1].up
 
-                for j in trange(len(self.twa_range), disable=not debug_mode):
+                for j in _range(len(self.twa_range)):
                     twa = self.twa_range[j]
 
                     self.vb0 = 0.8 * tws
@@ -190,89 +314,414 @@ class VPP(object):
 
         logging.info("Optimization successful.")
 
-    def run(self, verbose=False):
+    def run(self, verbose=False, checkpoint=None, resume=False, every=50):
         """
         Run the analysis for the given analysis range.
         Parameters
         ----------
         verbose
             A logical, if True, prints results of equilibrium at each TWA/TWS.
+        checkpoint
+            A string, file the analysis is periodically saved to, default is None.
+        resume
+            A logical, if True, restarts from the checkpoint, if it exists.
+        every
+            An integer, number of solved points between two checkpoints.
         """
+        if every < 1:
+            raise ValueError("Checkpoints need every >= 1, got %s." % every)
+        for _ in self.iter_run(verbose, checkpoint, resume, every):
+            pass
 
-        if not self.upToDate:
-            raise "VPP run stop: no analysis set!"
-
-        for i, tws in enumerate(self.tws_range):
-            logging.debug("Sailing in TWS : %.1f" % (tws / KNOTS_TO_MPS))
+        logging.info("Optimization successful.")
 
-            for n in range(self.Nsails):
-                self.aero.sails[1] = self.yacht.sails[n + 1]
+    def iter_run(self, verbose=False, checkpoint=None, resume=False, every=50):
+        """
+        Run the analysis for the given analysis range, yielding each point
+        as soon as it is solved. Closing the generator stops the analysis.
+        Parameters
+        ----------
+        verbose
+            A logical, if True, prints results of equilibrium at each TWA/TWS.
+        checkpoint
+            A string, file the analysis is periodically saved to, default is None.
+        resume
+            A logical, if True, restarts from the checkpoint, if it exists, and
+            skips the points that are already solved.
+        every
+            An integer, number of solved points between two checkpoints.
+        Yields
+        ------
+        dict
+            The TWS (knots), TWA (degrees) and sail set of the point, its
+            index in the store, the state (vb in knots, heel, leeway) and the
+            diagnostics (convergence status, residual evaluations) of the solve.
+            Points that failed to converge are yielded with a zero state.
+        """
 
-                logging.debug(
-                    "Sail Config : ",
-                    self.aero.sails[0].name + " + " + self.aero.sails[1].name,
-                )
+        if every < 1:
+            raise ValueError("Checkpoints need every >= 1, got %s." % every)
+        if not self.upToDate:
+            raise "VPP run stop: no analysis set!"
 
-                self.aero.up = self.aero.sails[1].up
+        if resume and checkpoint is not None and os.path.exists(checkpoint):
+            self.load_checkpoint(checkpoint)
+
+        solved = evals = 0
+        start = time.perf_counter()
+        try:
+            # states of the previous and current TWS, the warm starts
+            self._row = np.zeros(self.store.shape[1:])
+            for i, tws in enumerate(self.tws_range):
+                logging.debug("Sailing in TWS : %.1f" % (tws / KNOTS_TO_MPS))
+                self._prev = self._row
+                self._row = self._read(i) if resume else np.zeros_like(self._prev)
+
+                for n in range(self.Nsails):
+                    self._use_sails(n)
+
+                    for j in _range(len(self.twa_range)):
+                        twa = self.twa_range[j]
+
+                        if resume and self.status[i, j, n] != UNSOLVED:
+                            continue
+
+                        self.vb0, self.phi0, self.leeway0 = self._initial_guess(
+                            tws, twa
+                        )
+                        self.flat = 1.0
+                        self.red = 2.0
+
+                        if self._skip(twa):
+                            self.status[i, j, n] = SKIPPED
+                            continue
+
+                        res, status, nfev = self._solve_point(
+                            [self.vb0, self.phi0, self.leeway0],
+                            twa,
+                            tws,
+                            self._neighbour(i, j, n),
+                        )
+                        self.status[i, j, n] = status
+                        self.nfev[i, j, n] = nfev
+
+                        if status == FAILED:
+                            # never keep an unconverged state in the results
+                            logger.warning(
+                                "No equilibrium found at TWS %.1f, TWA %.1f with %s"
+                                % (tws / KNOTS_TO_MPS, twa, self.sail_name[n])
+                            )
+                            self._keep(i, j, n, np.zeros(self.store.shape[-1]))
+                        else:
+                            self.vb0, self.phi0, self.leeway0 = res
+
+                            logging.debug(
+                                "Equilibrium residuals (Fx, Fy, Mx): ",
+                                self.resid(res, twa, tws),
+                            )
+
+                            # store data for later
+                            x = np.zeros(self.store.shape[-1])
+                            x[: len(res)] = (
+                                res[:]
+                                * np.array([1.0 / KNOTS_TO_MPS, 1, 1, 1, 1])[: len(res)]
+                            )
+                            self._keep(i, j, n, x)
+
+                        solved += 1
+                        self.cursor = (i, j, n)
+                        if checkpoint is not None and solved % every == 0:
+                            self.save_checkpoint(checkpoint)
+
+                        evals += nfev
+                        self._check_budget(time.perf_counter() - start, evals)
+
+                        yield {
+                            "tws": tws / KNOTS_TO_MPS,
+                            "twa": twa,
+                            "sail": self.sail_name[n],
+                            "index": (i, j, n),
+                            "state": self._row[j, n, :3].tolist(),
+                            "diagnostics": {"status": int(status), "nfev": int(nfev)},
+                        }
+        finally:
+            # also when the generator is closed or the budget exceeded, such
+            # that no solved point is lost
+            self._flush()
+            if checkpoint is not None:
+                self.save_checkpoint(checkpoint)
+
+    def _check_budget(self, elapsed, evals):
+        if self.time_budget is not None and elapsed > self.time_budget:
+            raise BudgetExceeded(
+                "Time budget of %.1f s exceeded." % self.time_budget
+            )
+        if self.nfev_budget is not None and evals > self.nfev_budget:
+            raise BudgetExceeded(
+                "Budget of %d evaluations exceeded." % self.nfev_budget
+            )
 
-                for j in trange(len(self.twa_range), disable=not debug_mode):
-                    twa = self.twa_range[j]
+    def _keep(self, i, j, n, x):
+        # in-memory stores are written at once, memory-mapped ones a chunk
+        # of points at a time
+        self._row[j, n] = x
+        if not isinstance(self.store, np.memmap):
+            self.store[i, j, n] = x
+            return
+        self._pending[(i, j, n)] = x
+        if len(self._pending) >= self.chunk:
+            self._flush()
+
+    def _view(self, start, stop, mode="r"):
+        # map of the TWS rows start to stop of the store file only, its pages
+        # leave the resident memory once it is deleted
+        shape = self.store.shape
+        return np.memmap(
+            self.fname,
+            dtype=self.store.dtype,
+            mode=mode,
+            offset=self.store.offset + start * self.store[0].nbytes,
+            shape=(stop - start,) + shape[1:],
+        )
 
-                    self.vb0 = 0.8 * tws
-                    self.phi0 = 0
-                    self.leeway0 = (
-                        100.0 / twa
-                        if (twa > 1.0 and 100.0 / twa < 2 * tws)
-                        else 2 * tws
-                    )
-                    self.flat = 1.0
-                    self.red = 2.0
+    def _read(self, i):
+        # copy of the states at one TWS
+        if not isinstance(self.store, np.memmap):
+            return self.store[i].copy()
+        view = self._view(i, i + 1)
+        row = np.array(view[0])
+        del view
+        return row
+
+    def _flush(self):
+        if not isinstance(self.store, np.memmap) or not self._pending:
+            return
+        idx = np.array(list(self._pending))
+        lo = idx[:, 0].min()
+        view = self._view(lo, idx[:, 0].max() + 1, "r+")
+        view[idx[:, 0] - lo, idx[:, 1], idx[:, 2]] = list(self._pending.values())
+        view.flush()
+        del view
+        self._pending = {}
 
-                    # don't do low twa with downwind sails
-                    if (self.aero.up == True) and (twa >= self.lim_dn):
-                        continue
-                    if (self.aero.up == False) and (twa <= self.lim_up):
-                        continue
+    @staticmethod
+    def open_store(fname):
+        """
+        Lazily opens a memory-mapped store written by an analysis.
+        Parameters
+        ----------
+        fname
+            A string, the file passed to set_analysis.
+        Returns
+        -------
+        numpy.memmap
+            The read-only store, of shape (tws, twa, Nsails, 5); only the
+            slices that are accessed are read from disk.
+        """
+        return np.load(fname, mmap_mode="r")
 
-                    sol = root(
-                        self.resid,
-                        [self.vb0, self.phi0, self.leeway0],
-                        args=(twa, tws),
-                        method="lm",
-                    )
-                    self.vb0, self.phi0, self.leeway0 = res = sol.x
-                    
-                    if verbose and not sol.success:
-                        logger.debug(sol.message)
-
-                    # # contraints
-                    # con1 = {'type': 'eq', 'fun': self.Fx, 'args': (twa, tws)}
-                    # con2 = {'type': 'eq', 'fun': self.Fy, 'args': (twa, tws)}
-                    # con3 = {'type': 'eq', 'fun': self.Mx, 'args': (twa, tws)}
-                    # con = (con1, con2, con3)
-
-                    # # initial guess at this twa/tws
-                    # x0 = [self.vb0, self.phi0, self.leeway0, self.flat, self.red]
-
-                    # # minimize
-                    # sol = minimize(self.objective, args=(twa, tws), x0=x0, method='SLSQP',
-                    #                constraints=con, bounds=self.bnds, tol=1e-2,
-                    #                options={"maxiter": 100, "disp": verbose})
-
-                    # # get result
-                    # self.vb0, self.phi0, self.leeway0, self.flat, self.red = res = sol.x
-
-                    logging.debug(
-                        "Equilibrium residuals (Fx, Fy, Mx): ",
-                        self.resid(sol.x, twa, tws),
-                    )
+    def solve_points(self, tws, twa):
+        """
+        Solves the equilibrium at scattered (TWS, TWA) conditions, without
+        the need of a full analysis grid. Points are solved in order of TWS
+        and TWA, each warm-started from the nearest point already solved with
+        the same sails, and memoized such that repeated queries are free.
+        Parameters
+        ----------
+        tws
+            A numpy.array of TWS (knots).
+        twa
+            A numpy.array of TWA (degrees), broadcastable with tws.
+        Returns
+        -------
+        numpy.array
+            The state (vb in knots, heel, leeway) for each point and sail set,
+            of shape (N, Nsails, 3). Failed and skipped points are zero.
+        """
+        tws, twa = np.broadcast_arrays(
+            np.atleast_1d(np.asarray(tws, dtype=float)),
+            np.atleast_1d(np.asarray(twa, dtype=float)),
+        )
+        tws, twa = tws.ravel(), twa.ravel()
+        self._set_sails()
+
+        out = np.zeros((tws.size, self.Nsails, 3))
+        order = np.lexsort((twa, tws))
+        for n in range(self.Nsails):
+            self._use_sails(n)
+            for k in order:
+                key = (round(tws[k], 6), round(twa[k], 6), n)
+                if key not in self._memo:
+                    if len(self._memo) >= self.memo_size:
+                        self._memo.clear()
+                        self._solved.clear()
+                    self._memo[key] = self._solve_memo(*key)
+                x, status = self._memo[key]
+                if status < FAILED:
+                    out[k, n] = x * np.array([1.0 / KNOTS_TO_MPS, 1, 1])
+        return out
+
+    def _solve_memo(self, tws, twa, n):
+        if self._skip(twa):
+            return np.zeros(3), SKIPPED
+        guess = self._initial_guess(tws * KNOTS_TO_MPS, twa)
+
+        # nearest converged query with the same sails, 1 knot ~ 10 degrees
+        keys, states = self._solved.setdefault(n, ([], []))
+        neighbour = None
+        if keys:
+            dist = np.asarray(keys) - (tws, twa)
+            dist = dist[:, 0] ** 2 + (dist[:, 1] / 10.0) ** 2
+            neighbour = states[np.argmin(dist)]
+
+        x, status, _ = self._solve_point(guess, twa, tws * KNOTS_TO_MPS, neighbour)
+        if status == FAILED:
+            return np.zeros(3), status
+        keys.append((tws, twa))
+        states.append(x)
+        return x, status
+
+    def _neighbour(self, i, j, n):
+        """
+        Returns the state of the closest converged point, the previous TWA
+        or else the previous TWS with the same sails, to warm-start the solver.
+        """
+        for ii, jj, row in ((i, j - 1, self._row), (i - 1, j, self._prev)):
+            if ii >= 0 and jj >= 0 and CONVERGED <= self.status[ii, jj, n] < FAILED:
+                return row[jj, n, :3] * np.array([KNOTS_TO_MPS, 1, 1])
+        return None
 
-                    # store data for later
-                    self.store[i, j, n, : len(res)] = (
-                        res[:] * np.array([1.0 / KNOTS_TO_MPS, 1, 1, 1, 1])[: len(res)]
-                    )
+    def _ladder(self, x0, neighbour):
+        """
+        Generates the successive (status, initial guess, method) stages
+        tried to find the equilibrium of a point.
+        """
+        x0 = np.asarray(x0, dtype=float)
+        yield CONVERGED, x0, "lm"
+        if neighbour is not None:
+            yield WARM_START, np.asarray(neighbour, dtype=float), "lm"
+        # same sequence of perturbations at every point, for reproducibility
+        rng = np.random.default_rng(0)
+        for _ in range(self.n_perturb):
+            x = x0 * rng.uniform(0.5, 1.5, 3)
+            x[1] = rng.uniform(0.0, self.phi_max)
+            yield PERTURBED, x, "lm"
+        yield BACKEND, x0, self.backend
+
+    def _solve_point(self, x0, twa, tws, neighbour=None):
+        """
+        Finds the equilibrium at a single TWA/TWS, climbing the retry ladder
+        until a stage converges.
+        Parameters
+        ----------
+        x0
+            A list of the initial guess (vb, phi, leeway).
+        twa
+            A float of the TWA.
+        tws
+            A float of the TWS.
+        neighbour
+            A numpy array of a converged neighbouring state, or None.
+        Returns
+        -------
+        tuple
+            The equilibrium, the convergence status and the number of
+            evaluations of the residuals.
+        """
+        nfev = 0
+        for status, x, method in self._ladder(x0, neighbour):
+            key = "maxiter" if method == "lm" else "maxfev"
+            sol = root(
+                self.resid,
+                x,
+                args=(twa, tws),
+                method=method,
+                options={key: self.max_nfev},
+            )
+            nfev += sol.nfev
+            if self._converged(sol, twa, tws):
+                return sol.x, status, nfev
+            logger.debug(sol.message)
+        return sol.x, FAILED, nfev
+
+    def _converged(self, sol, twa, tws):
+        if not (sol.success and np.all(np.isfinite(sol.x))):
+            return False
+        return np.sqrt(np.max(self.resid(sol.x, twa, tws))) <= self.res_tol
+
+    def save_checkpoint(self, fname):
+        """
+        Atomically saves the analysis (grid, store, diagnostics) to file.
+        Parameters
+        ----------
+        fname
+            A string, name of the checkpoint file.
+        """
+        self._flush()
+        arrays = dict(
+            tws=self.tws_range,
+            twa=self.twa_range,
+            sails=np.array(self.sail_name),
+            status=self.status,
+            nfev=self.nfev,
+            cursor=np.array(self.cursor),
+        )
+        tmp = fname + ".tmp"
+        with open(tmp, "wb") as f:
+            if isinstance(self.store, np.memmap):
+                self._savez_rows(f, arrays)
+            else:
+                np.savez(f, store=self.store, **arrays)
+        # a crash while writing never corrupts the previous checkpoint
+        os.replace(tmp, fname)
+
+    def _savez_rows(self, f, arrays):
+        # same archive as numpy.savez, with the memory-mapped store copied
+        # one TWS at a time
+        with zipfile.ZipFile(f, "w", allowZip64=True) as zf:
+            for key, val in arrays.items():
+                with zf.open(key + ".npy", "w", force_zip64=True) as fid:
+                    np.lib.format.write_array(fid, np.asanyarray(val))
+            with zf.open("store.npy", "w", force_zip64=True) as fid:
+                np.lib.format.write_array_header_1_0(
+                    fid,
+                    {
+                        "descr": np.lib.format.dtype_to_descr(self.store.dtype),
+                        "fortran_order": False,
+                        "shape": self.store.shape,
+                    },
+                )
+                for i in range(self.store.shape[0]):
+                    fid.write(self._read(i).tobytes())
 
-        logging.info("Optimization successful.")
+    def load_checkpoint(self, fname):
+        """
+        Restores the analysis from a checkpoint of the same analysis range.
+        Parameters
+        ----------
+        fname
+            A string, name of the checkpoint file.
+        """
+        with np.load(fname) as data:
+            if (
+                not np.array_equal(data["tws"], self.tws_range)
+                or not np.array_equal(data["twa"], self.twa_range)
+                or data["sails"].tolist() != self.sail_name
+            ):
+                raise ValueError(
+                    "Checkpoint %s does not match the analysis range." % fname
+                )
+            if isinstance(self.store, np.memmap):
+                view = self._view(0, self.store.shape[0], "r+")
+                view[...] = data["store"]
+                view.flush()
+                del view
+            else:
+                self.store[...] = data["store"]
+            self.status[...] = data["status"]
+            self.nfev[...] = data["nfev"]
+            self.cursor = tuple(data["cursor"].tolist())
+        logging.info("Resuming from %s." % fname)
 
     def resid(self, x0, twa, tws):
         """
@@ -315,20 +764,37 @@ class VPP(object):
     def Mx(self, x0, twa, tws):
         return self.resid(x0, twa, tws)[2]
 
-    def results(self):
+    def results(self, array=False):
         """
         Return a dict of the VPP results.
+        Parameters
+        ----------
+        array
+            A logical, if True the results are the store array itself
+            instead of nested lists, default is False. Memory-mapped stores
+            are always returned as the array.
         """
+        array = array or isinstance(self.store, np.memmap)
         return {
             "name": self.yacht.Name,
             "tws": self.tws_range.tolist(),
             "twa": self.twa_range.tolist(),
             "sails": self.sail_name,
-            "results": self.store.tolist(),
+            "results": self.store if array else self.store.tolist(),
         }
 
     def write(self, fname):
-        json_write(self.results(), fname)
+        if not isinstance(self.store, np.memmap):
+            return json_write(self.results(), fname)
+        # same file as json_write, with the store written one TWS at a time
+        head = {k: v for k, v in self.results().items() if k != "results"}
+        head = json.dumps(head, ensure_ascii=False, indent=2)
+        with open(fname + ".json", "w") as f:
+            f.write(head[:-2] + ',\n  "results": [')
+            for i in range(self.store.shape[0]):
+                row = json.dumps(self._read(i).tolist())
+                f.write((",\n    " if i else "\n    ") + row)
+            f.write("\n  ]\n}")
 
     def polar(self, n=1, save=False, fname="Polars.png"):
         polar_plot([self], n, save, fname)
@@ -7,6 +7,10 @@ __license__ = "GPL"
 __version__ = "1.0.1"
 __email__ = "M.Lauber@soton.ac.uk"
 
+import hashlib
+import json
+from functools import lru_cache
+
 import numpy as np
 from src.UtilsMod import build_interp_func,json_read,json_write
 from scipy import interpolate
@@ -149,13 +153,36 @@ class Yacht(object):
         # populate everything
         self.update()
 
+        # identifies the design, computed before any model measures the sails
+        self.fingerprint = self._fingerprint()
+
 
-    def _build_rm_interp(self):
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _build_rm_interp():
+        # read once per process and shared by all yachts
         a = json_read('righting_moment')
         return interpolate.interp1d(np.array(a["Heel"]), np.array(a["GZ"]),
                                     kind="linear", fill_value="extrapolate")
 
 
+    def _fingerprint(self):
+        """
+        Hash of the particulars of the yacht, its appendages and its sails.
+        """
+        scalars = lambda obj: {
+            attr: value
+            for attr, value in obj.__dict__.items()
+            if isinstance(value, (bool, int, float, str))
+        }
+        dic = {
+            "yacht": scalars(self),
+            "appendages": [scalars(app) for app in self.appendages],
+            "sails": [scalars(sail) for sail in self.sails],
+        }
+        return hashlib.sha1(json.dumps(dic, sort_keys=True).encode()).hexdigest()
+
+
     def update(self):
         self.lsm = self.l
         self.lvr = self.lsm / self.vol ** (1.0 / 3.0)
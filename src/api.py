@@ -2,24 +2,114 @@
 API for calling VPPMod
 
 """
+import hashlib
+import json
 import logging
 import os
 import sys
+import time
+from concurrent.futures import as_completed
 from typing import Any, Dict
 
 import numpy as np
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 
 sys.path.append(os.path.realpath("."))
+from src.CacheMod import ResponseCache, request_key
+from src.EncodeMod import DTYPES, JSON, encode, mimetypes
+from src.MetricsMod import Counter, Gauge, Histogram, Registry
+from src.JobsMod import (
+    CANCELLED,
+    DONE,
+    FAILED,
+    AdmissionControl,
+    JobQueue,
+    Rejected,
+)
 from src.SailMod import Jib, Kite, Main
-from src.VPPMod import VPP
+from src.VPPMod import FAILED as POINT_FAILED
+from src.VPPMod import SKIPPED, UNSOLVED, VPP, BudgetExceeded, preload
 from src.YachtMod import Keel, Rudder, Yacht
 
 app = Flask(__name__)
+app.config.update(
+    # largest analysis admitted, in (tws, twa, sail) points
+    MAX_POINTS=int(os.environ.get("VPP_MAX_POINTS", 10000)),
+    # compute budgets of an analysis, clients can only lower them
+    TIME_BUDGET=float(os.environ.get("VPP_TIME_BUDGET", 300.0)),
+    NFEV_BUDGET=int(os.environ.get("VPP_NFEV_BUDGET", 0)) or None,
+    # largest number of jobs queued or running on the workers
+    MAX_JOBS=int(os.environ.get("VPP_MAX_JOBS", 500)),
+    RETRY_AFTER=int(os.environ.get("VPP_RETRY_AFTER", 5)),
+)
 
 logging.basicConfig(level=logging.INFO)
 
 
+class RequestError(Exception):
+    """A request that cannot be served, returned as a JSON error."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+@app.errorhandler(RequestError)
+def request_error(e):
+    return jsonify({"error": str(e)}), e.status
+
+
+@app.errorhandler(Rejected)
+def rejected(e):
+    response = jsonify({"error": str(e)})
+    response.headers["Retry-After"] = str(app.config["RETRY_AFTER"])
+    return response, 429
+
+
+@app.errorhandler(BudgetExceeded)
+def budget_exceeded(e):
+    return jsonify({"error": str(e)}), 503
+
+
+# reference request, the YD-41 from Larsson
+YD41 = {
+    "name": "YD41",
+    "yacht": {
+        "Name": "YD41",
+        "Lwl": 11.90,
+        "Vol": 6.05,
+        "Bwl": 3.18,
+        "Tc": 0.4,
+        "WSA": 28.20,
+        "Tmax": 2.30,
+        "Amax": 1.051,
+        "Mass": 6500,
+        "Ff": 1.5,
+        "Fa": 1.5,
+        "Boa": 4.2,
+        "Loa": 12.5,
+    },
+    "keel": {"Cu": 1.00, "Cl": 0.78, "Span": 1.90},
+    "rudder": {"Cu": 0.48, "Cl": 0.22, "Span": 1.15},
+    "main": {"Name": "MN1", "P": 16.60, "E": 5.60, "Roach": 0.1, "BAD": 1.0},
+    "jib": {"Name": "J1", "I": 16.20, "J": 5.10, "LPG": 5.40, "HBI": 1.8},
+    "kite": {"Name": "A2", "area": 150.0, "vce": 9.55},
+    "tws_range": [4.0, 12.0],
+    "twa_range": [45.0, 90.0, 150.0],
+}
+
+
+def warm_up():
+    """
+    Loads the data tables and runs a solve of the reference yacht, such that
+    the first request is as fast as the next ones. Called by the server before
+    forking its workers, which then share the loaded pages.
+    """
+    preload()
+    solve(YD41)
+    logging.info("Warm-up done.")
+
+
 @app.route("/ping")
 def ping():
     logging.info("Ping route hit successfully.")
@@ -89,12 +179,374 @@ def makevppresults():
     data = request.get_json()
 
     # TODO: Support multiple implementations of different sails: require API design
-    # TODO: Error handling incorrect ranges
+    vpp = admit(data)
+
+    # identical requests give identical results, whatever the client; the
+    # encoding is negotiated, and checked, before anything is solved
+    key = request_key(data)
+    etag = hashlib.sha1(("%s %s %s" % ((key,) + negotiate())).encode()).hexdigest()
+    if etag in request.if_none_match:
+        response = Response(status=304)
+        response.vary.add("Accept")
+        response.set_etag(etag)
+        return response
+
+    def compute():
+        with admission.slot(vpp.count_points()):
+            start = time.perf_counter()
+            try:
+                vpp.run(verbose=True)
+            finally:
+                record_solve(vpp, time.perf_counter() - start)
+        return vpp.results(array=True)
+
+    # requests only share an analysis solved within the same budgets, such
+    # that none inherits the budget error of a smaller one
+    budgets = request_key([key, vpp.time_budget, vpp.nfev_budget])
+    return respond(cache.get(budgets, compute), etag)
+
+
+def admit(data: Dict[str, Any]) -> VPP:
+    """
+    Validates a request and builds its VPP, raises RequestError if the payload
+    is invalid or the analysis too large. The budgets of the server can be
+    lowered with ?time_budget= (seconds) and ?nfev_budget= (evaluations).
+    """
+    try:
+        tws = np.array(data["tws_range"], dtype=float)
+        twa = np.array(data["twa_range"], dtype=float)
+    except (KeyError, TypeError, ValueError):
+        raise RequestError("tws_range and twa_range must be lists of numbers")
+    if tws.ndim != 1 or twa.ndim != 1 or tws.size == 0 or twa.size == 0:
+        raise RequestError("tws_range and twa_range must be non-empty lists")
+    if not (np.all(np.isfinite(tws)) and np.all(np.isfinite(twa))):
+        raise RequestError("tws_range and twa_range must be finite numbers")
+    if tws.min() < 2.0 or tws.max() > 35.0:
+        raise RequestError("TWS must be within 2 and 35 knots")
+    if twa.min() < 0.0 or twa.max() > 180.0:
+        raise RequestError("TWA must be within 0 and 180 degrees")
 
+    try:
+        vpp = data_to_vpp(data)
+    except (KeyError, TypeError, ValueError) as e:
+        raise RequestError("invalid payload, %s: %s" % (type(e).__name__, e))
+
+    cost = vpp.count_points()
+    if cost > app.config["MAX_POINTS"]:
+        raise RequestError(
+            "analysis of %d points exceeds the limit of %d points"
+            % (cost, app.config["MAX_POINTS"]),
+            413,
+        )
+
+    vpp.time_budget = app.config["TIME_BUDGET"]
+    vpp.nfev_budget = app.config["NFEV_BUDGET"]
+    try:
+        if "time_budget" in request.args:
+            vpp.time_budget = min(float(request.args["time_budget"]), vpp.time_budget)
+        if "nfev_budget" in request.args:
+            nfev = int(request.args["nfev_budget"])
+            vpp.nfev_budget = nfev if vpp.nfev_budget is None else min(nfev, vpp.nfev_budget)
+    except ValueError:
+        raise RequestError("budgets must be numbers")
+    return vpp
+
+
+def solve(data: Dict[str, Any], time_budget=None, nfev_budget=None) -> Dict[str, Any]:
+    """
+    Runs the VPP of a request and returns its results, with the store as an array.
+    """
     vpp = data_to_vpp(data)
+    vpp.time_budget = time_budget
+    vpp.nfev_budget = nfev_budget
     vpp.run(verbose=True)
+    return vpp.results(array=True)
+
+
+def negotiate():
+    """
+    Returns the encoding negotiated from the Accept header, JSON by default,
+    and the dtype of binary stores, float64 unless ?dtype=float32. Raises
+    RequestError for an unknown dtype, before anything is solved.
+    """
+    mimetype = request.accept_mimetypes.best_match(mimetypes(), default=JSON)
+    dtype = request.args.get("dtype", "float64")
+    if mimetype != JSON and dtype not in DTYPES:
+        raise RequestError("dtype must be one of %s" % list(DTYPES))
+    return mimetype, dtype
+
+
+def respond(results: Dict[str, Any], etag=None) -> Response:
+    """
+    Encodes the results in the negotiated format.
+    """
+    mimetype, dtype = negotiate()
+    if mimetype == JSON:
+        response = jsonify(dict(results, results=results["results"].tolist()))
+    else:
+        response = Response(encode(results, mimetype, dtype), mimetype=mimetype)
+    # the representation depends on the Accept header
+    response.vary.add("Accept")
+    if etag is not None:
+        response.set_etag(etag)
+    return response
+
+
+cache = ResponseCache(
+    maxsize=int(os.environ.get("VPP_CACHE_SIZE", 128)),
+    ttl=float(os.environ.get("VPP_CACHE_TTL", 3600.0)),
+)
+
+
+jobs = JobQueue(solve)
+
+admission = AdmissionControl(
+    slots=int(os.environ.get("VPP_SLOTS", 2)),
+    max_waiting=int(os.environ.get("VPP_MAX_WAITING", 16)),
+    timeout=float(os.environ.get("VPP_WAIT_TIMEOUT", 30.0)),
+)
+
+# in-process metrics, the analyses run by the job workers are not included
+metrics = Registry()
+requests_total = metrics.register(
+    Counter("vpp_requests_total", "HTTP requests served.", ("endpoint", "status"))
+)
+solve_seconds = metrics.register(
+    Histogram(
+        "vpp_solve_seconds",
+        "Duration of the analyses, by grid size in points.",
+        [0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0],
+        ("points",),
+    )
+)
+points_solved = metrics.register(
+    Counter("vpp_points_solved_total", "Points solved by the analyses.")
+)
+points_failed = metrics.register(
+    Counter("vpp_convergence_failures_total", "Points that failed to converge.")
+)
+throughput = {"points_per_second": 0.0}
+metrics.register(
+    Gauge(
+        "vpp_points_per_second",
+        "Points solved per second by the last analysis.",
+        lambda: throughput["points_per_second"],
+    )
+)
+metrics.register(
+    Gauge("vpp_jobs_in_flight", "Jobs queued or running.", lambda: jobs.queued())
+)
+metrics.register(
+    Gauge(
+        "vpp_admission_waiting",
+        "Requests waiting for a slot.",
+        lambda: len(admission.waiting),
+    )
+)
+metrics.register(
+    Gauge("vpp_admission_running", "Analyses running.", lambda: admission.running)
+)
+for name in ["hits", "misses", "coalesced"]:
+    metrics.register(
+        Gauge(
+            "vpp_cache_%s_total" % name,
+            "Response cache %s." % name,
+            lambda name=name: getattr(cache, name),
+            kind="counter",
+        )
+    )
+metrics.register(
+    Gauge(
+        "vpp_cache_hit_ratio",
+        "Share of the response cache lookups that hit.",
+        lambda: cache.hits / max(1, cache.hits + cache.misses + cache.coalesced),
+    )
+)
+
+
+def record_solve(vpp: VPP, elapsed: float) -> None:
+    attempted = (vpp.status != UNSOLVED) & (vpp.status != SKIPPED)
+    failed = int(np.sum(vpp.status == POINT_FAILED))
+    solved = int(np.sum(attempted)) - failed
+    points_solved.inc(solved)
+    points_failed.inc(failed)
+    throughput["points_per_second"] = solved / elapsed if elapsed > 0.0 else 0.0
+
+    points = vpp.count_points()
+    size = next((str(b) for b in [100, 1000, 10000] if points <= b), "+Inf")
+    solve_seconds.observe(elapsed, points=size)
+
+
+@app.after_request
+def count_request(response):
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    requests_total.inc(endpoint=endpoint, status=response.status_code)
+    return response
+
+
+@app.route("/metrics")
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/api/vpp/stream/", methods=["POST"])
+def streamvppresults():
+    """
+    Streams the analysis as it runs, one record per solved point plus
+    progress records with an ETA, as NDJSON or as server-sent events if
+    the client accepts text/event-stream. ?progress=N sets the number of
+    points between two progress records.
+    """
+    data = request.get_json()
+    try:
+        every = max(1, int(request.args.get("progress", 10)))
+    except ValueError:
+        raise RequestError("progress must be an integer")
+    sse = request.accept_mimetypes.best_match(
+        ["application/x-ndjson", "text/event-stream"], default="application/x-ndjson"
+    ) == "text/event-stream"
+
+    vpp = admit(data)
+    total = vpp.count_points()
+    # the slot is held until the stream ends
+    admission.acquire(total)
+
+    def record(kind, **values):
+        if sse:
+            return "event: %s\ndata: %s\n\n" % (kind, json.dumps(values))
+        return json.dumps(dict(values, type=kind)) + "\n"
+
+    def stream():
+        start = time.perf_counter()
+        yield record(
+            "start",
+            name=vpp.yacht.Name,
+            tws=vpp.tws_range.tolist(),
+            twa=vpp.twa_range.tolist(),
+            sails=vpp.sail_name,
+            total=total,
+        )
+        solved = 0
+        try:
+            for point in vpp.iter_run():
+                solved += 1
+                yield record("point", **point)
+                if solved % every == 0 and solved < total:
+                    elapsed = time.perf_counter() - start
+                    yield record(
+                        "progress",
+                        solved=solved,
+                        total=total,
+                        elapsed=elapsed,
+                        eta=elapsed / solved * (total - solved),
+                    )
+        except BudgetExceeded as e:
+            yield record("error", error=str(e))
+            return
+        finally:
+            record_solve(vpp, time.perf_counter() - start)
+        yield record("done", solved=solved, elapsed=time.perf_counter() - start)
+
+    response = Response(
+        stream(), mimetype="text/event-stream" if sse else "application/x-ndjson"
+    )
+    # also called if the client goes away before the stream starts
+    response.call_on_close(admission.release)
+    return response
+
+
+@app.route("/api/vpp/batch/", methods=["POST"])
+def makebatchresults():
+    """
+    Solves a list of configurations in parallel on the job workers, which
+    each load the data tables once. One JSON line is streamed back per
+    configuration as soon as it is solved, in order of completion.
+    """
+    data = request.get_json()
+    configs = data.get("configs") if isinstance(data, dict) else data
+    if not isinstance(configs, list):
+        raise RequestError("expected a list of configurations")
+
+    errors, admitted = {}, {}
+    for k, config in enumerate(configs):
+        try:
+            vpp = admit(config)
+            admitted[k] = (config, vpp.time_budget, vpp.nfev_budget), vpp.count_points()
+        except RequestError as e:
+            errors[k] = str(e)
+
+    # queued with the other jobs, such that they count against MAX_JOBS
+    ids = jobs.submit_batch(list(admitted.values()), app.config["MAX_JOBS"])
+    futures = {jobs.future(job_id): k for job_id, k in zip(ids, admitted)}
+
+    def stream():
+        for k, error in errors.items():
+            yield json.dumps({"index": k, "error": error}) + "\n"
+        try:
+            for future in as_completed(futures):
+                line = {"index": futures[future]}
+                try:
+                    results = future.result()
+                    line.update(results, results=results["results"].tolist())
+                except Exception as e:
+                    line["error"] = str(e)
+                yield json.dumps(line) + "\n"
+        finally:
+            # the client went away, drop what has not started
+            for future in futures:
+                future.cancel()
+
+    return Response(stream(), mimetype="application/x-ndjson")
+
+
+@app.route("/api/jobs/", methods=["POST"])
+def submit_job():
+    data = request.get_json()
+    vpp = admit(data)
+    job_id = jobs.submit(
+        data,
+        vpp.time_budget,
+        vpp.nfev_budget,
+        cost=vpp.count_points(),
+        limit=app.config["MAX_JOBS"],
+    )
+    response = jsonify({"id": job_id, "status": jobs.status(job_id)})
+    response.headers["Location"] = "/api/jobs/%s" % job_id
+    return response, 202
+
+
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    status = jobs.status(job_id)
+    if status is None:
+        return jsonify({"error": "unknown job %s" % job_id}), 404
+    return jsonify({"id": job_id, "status": status})
+
+
+@app.route("/api/jobs/<job_id>/result", methods=["GET"])
+def job_result(job_id):
+    status = jobs.status(job_id)
+    if status is None:
+        return jsonify({"error": "unknown job %s" % job_id}), 404
+    if status == DONE:
+        return respond(jobs.result(job_id))
+    if status == FAILED:
+        try:
+            jobs.result(job_id)
+        except Exception as e:
+            return jsonify({"id": job_id, "status": status, "error": str(e)}), 500
+    if status == CANCELLED:
+        return jsonify({"id": job_id, "status": status}), 410
+    # not finished yet
+    return jsonify({"id": job_id, "status": status}), 202
+
+
+@app.route("/api/jobs/<job_id>", methods=["DELETE"])
+def cancel_job(job_id):
+    if jobs.status(job_id) is None:
+        return jsonify({"error": "unknown job %s" % job_id}), 404
+    return jsonify({"id": job_id, "status": jobs.cancel(job_id)})
 
-    return jsonify(vpp.results())
 
 if __name__ == "__main__":
     app.run(debug=True)
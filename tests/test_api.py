@@ -1,8 +1,17 @@
 import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 import numpy as np
+import pytest
 
-from src.api import app
+from src.api import admission, app, cache, warm_up
+from src.CacheMod import ResponseCache
+from src.EncodeMod import JSON, NPZ, RAW, decode
+from src.JobsMod import AdmissionControl, JobQueue, Rejected
+from src.UtilsMod import load_table
 
 def test_ping_route():
     client = app.test_client()
@@ -62,3 +71,352 @@ def test_vpp_simulation():
 
     assert response.status_code == 200
 
+
+
+def test_vpp_binary_encodings():
+    d = make_yd41()
+    headers = {"content-type": "application/json"}
+
+    client = app.test_client()
+    response = client.post("/api/vpp/", data=json.dumps(d), headers=headers)
+    ref = decode(response.data, JSON)
+
+    for mimetype in [RAW, NPZ]:
+        response = client.post(
+            "/api/vpp/",
+            data=json.dumps(d),
+            headers=dict(headers, Accept=mimetype),
+        )
+        assert response.status_code == 200
+        assert response.mimetype == mimetype
+        assert "Accept" in response.vary
+        res = decode(response.data, mimetype)
+        assert res["sails"] == ref["sails"]
+        assert res["tws"] == ref["tws"]
+        np.testing.assert_array_equal(res["results"], ref["results"])
+
+    response = client.post(
+        "/api/vpp/?dtype=float32",
+        data=json.dumps(d),
+        headers=dict(headers, Accept=RAW),
+    )
+    res = decode(response.data, RAW)
+    assert res["results"].dtype == np.float32
+    np.testing.assert_allclose(res["results"], ref["results"], rtol=1e-6)
+
+    # an unknown dtype is rejected before solving
+    misses = cache.misses
+    response = client.post(
+        "/api/vpp/?dtype=int8",
+        data=json.dumps(dict(d, twa_range=[50.0, 100.0])),
+        headers=dict(headers, Accept=RAW),
+    )
+    assert response.status_code == 400 and "error" in response.json
+    assert cache.misses == misses
+
+
+def test_vpp_jobs():
+    d = make_yd41()
+    headers = {"content-type": "application/json"}
+
+    client = app.test_client()
+    ref = client.post("/api/vpp/", data=json.dumps(d), headers=headers).json
+
+    response = client.post("/api/jobs/", data=json.dumps(d), headers=headers)
+    assert response.status_code == 202
+    job = response.json["id"]
+    assert response.headers["Location"] == "/api/jobs/%s" % job
+
+    for _ in range(600):
+        response = client.get("/api/jobs/%s/result" % job)
+        if response.status_code != 202:
+            break
+        time.sleep(0.1)
+    assert response.status_code == 200
+    assert client.get("/api/jobs/%s" % job).json["status"] == "done"
+    np.testing.assert_array_equal(response.json["results"], ref["results"])
+
+    assert client.get("/api/jobs/unknown").status_code == 404
+    assert client.delete("/api/jobs/unknown").status_code == 404
+
+
+def test_vpp_cache():
+    d = make_yd41()
+    d["twa_range"] = [45.0, 90.0]
+    headers = {"content-type": "application/json"}
+    client = app.test_client()
+    cache.clear()
+
+    first = client.post("/api/vpp/", data=json.dumps(d), headers=headers)
+    hits = cache.hits
+    # same payload, different key order
+    again = dict(reversed(list(d.items())))
+    second = client.post("/api/vpp/", data=json.dumps(again), headers=headers)
+    assert cache.hits == hits + 1
+    assert second.data == first.data
+    assert second.headers["ETag"] == first.headers["ETag"]
+
+    response = client.post(
+        "/api/vpp/",
+        data=json.dumps(d),
+        headers=dict(headers, **{"If-None-Match": first.headers["ETag"]}),
+    )
+    assert response.status_code == 304
+    assert response.data == b""
+
+    # another representation has another tag
+    response = client.post(
+        "/api/vpp/",
+        data=json.dumps(d),
+        headers=dict(headers, Accept=RAW, **{"If-None-Match": first.headers["ETag"]}),
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] != first.headers["ETag"]
+
+
+def test_cache_budgets():
+    d = make_yd41()
+    d["twa_range"] = [50.0, 130.0]
+    headers = {"content-type": "application/json"}
+    cache.clear()
+    coalesced = cache.coalesced
+
+    def post(path):
+        return app.test_client().post(path, data=json.dumps(d), headers=headers)
+
+    # concurrent requests of different budgets are solved separately
+    with ThreadPoolExecutor(2) as pool:
+        small = pool.submit(post, "/api/vpp/?nfev_budget=1")
+        large = pool.submit(post, "/api/vpp/")
+        assert small.result().status_code == 503
+        assert large.result().status_code == 200
+    assert cache.coalesced == coalesced
+
+
+def test_cache_coalescing():
+    cache = ResponseCache(maxsize=2, ttl=60.0)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return len(calls)
+
+    with ThreadPoolExecutor(8) as pool:
+        values = list(pool.map(lambda _: cache.get("key", compute), range(8)))
+    assert values == [1] * 8 and len(calls) == 1
+    assert cache.misses == 1 and cache.hits + cache.coalesced == 7
+
+    cache.get("a", lambda: 0)
+    cache.get("b", lambda: 0)
+    assert len(cache) == 2 and cache.get("key", compute) == 2
+
+
+def test_vpp_batch():
+    configs = []
+    for mass in [6000.0, 6500.0, 7000.0]:
+        d = make_yd41()
+        d["yacht"]["Mass"] = mass
+        d["twa_range"] = [45.0, 90.0]
+        configs.append(d)
+    configs.append({"yacht": {}})
+    headers = {"content-type": "application/json"}
+
+    client = app.test_client()
+    response = client.post(
+        "/api/vpp/batch/", data=json.dumps({"configs": configs}), headers=headers
+    )
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert sorted(line["index"] for line in lines) == [0, 1, 2, 3]
+
+    lines = {line["index"]: line for line in lines}
+    assert "error" in lines[3]
+    ref = client.post("/api/vpp/", data=json.dumps(configs[1]), headers=headers).json
+    np.testing.assert_array_equal(lines[1]["results"], ref["results"])
+    # heavier boats are slower
+    speed = [np.max(np.array(lines[k]["results"])[..., 0]) for k in range(3)]
+    assert speed[0] > speed[1] > speed[2]
+
+    for body in [{"nope": 1}, {"configs": "YD41"}]:
+        response = client.post("/api/vpp/batch/", data=json.dumps(body), headers=headers)
+        assert response.status_code == 400 and "error" in response.json
+
+
+def test_vpp_stream():
+    d = make_yd41()
+    headers = {"content-type": "application/json"}
+
+    client = app.test_client()
+    ref = client.post("/api/vpp/", data=json.dumps(d), headers=headers).json
+    with client.post(
+        "/api/vpp/stream/?progress=2", data=json.dumps(d), headers=headers
+    ) as response:
+        assert response.mimetype == "application/x-ndjson"
+        records = [json.loads(line) for line in response.data.decode().splitlines()]
+
+    start, points, done = records[0], records[1:-1], records[-1]
+    assert start["type"] == "start" and done["type"] == "done"
+    assert start["sails"] == ref["sails"]
+    progress = [r for r in points if r["type"] == "progress"]
+    points = [r for r in points if r["type"] == "point"]
+    assert len(points) == start["total"] == done["solved"]
+    assert progress and all(r["eta"] >= 0.0 for r in progress)
+
+    results = np.zeros_like(np.array(ref["results"]))
+    for point in points:
+        results[tuple(point["index"])][:3] = point["state"]
+    np.testing.assert_array_equal(results, ref["results"])
+
+    with client.post(
+        "/api/vpp/stream/",
+        data=json.dumps(d),
+        headers=dict(headers, Accept="text/event-stream"),
+    ) as response:
+        assert response.mimetype == "text/event-stream"
+        assert response.data.decode().startswith("event: start\ndata: {")
+    assert admission.running == 0
+
+    response = client.post(
+        "/api/vpp/stream/?progress=abc", data=json.dumps(d), headers=headers
+    )
+    assert response.status_code == 400 and "error" in response.json
+    assert admission.running == 0
+
+
+def test_vpp_admission():
+    d = make_yd41()
+    headers = {"content-type": "application/json"}
+    client = app.test_client()
+
+    invalid = [
+        ([1.0, 4.0], [30.0]),
+        ([4.0], [30.0, 190.0]),
+        ([], [30.0]),
+        ([float("nan")], [30.0]),
+        ([4.0], [float("inf")]),
+    ]
+    for tws, twa in invalid:
+        bad = dict(d, tws_range=tws, twa_range=twa)
+        response = client.post("/api/vpp/", data=json.dumps(bad), headers=headers)
+        assert response.status_code == 400
+        assert "error" in response.json
+
+    large = dict(d, twa_range=np.linspace(0.0, 180.0, 181).tolist())
+    limit = app.config["MAX_POINTS"]
+    app.config["MAX_POINTS"] = 100
+    try:
+        response = client.post("/api/vpp/", data=json.dumps(large), headers=headers)
+        assert response.status_code == 413
+    finally:
+        app.config["MAX_POINTS"] = limit
+
+    # a budget too small to finish, results are not cached
+    d["twa_range"] = [60.0, 120.0]
+    response = client.post(
+        "/api/vpp/?nfev_budget=1", data=json.dumps(d), headers=headers
+    )
+    assert response.status_code == 503
+    assert admission.running == 0
+
+
+def test_admission_priority():
+    control = AdmissionControl(slots=1, max_waiting=2, timeout=5.0)
+    order = []
+
+    def request(cost):
+        with control.slot(cost):
+            order.append(cost)
+            time.sleep(0.05)
+
+    control.acquire(0)
+    with ThreadPoolExecutor(3) as pool:
+        for cost in [100, 1]:
+            pool.submit(request, cost)
+        while len(control.waiting) < 2:
+            time.sleep(0.01)
+        # the queue is full
+        with pytest.raises(Rejected):
+            control.acquire(10)
+        control.release()
+    assert order == [1, 100]
+
+
+def test_job_priority():
+    jobs = JobQueue(time.sleep, workers=1)
+    order = []
+    try:
+        # the worker is busy, the other jobs wait cheapest first
+        ids = [jobs.submit(0.5, cost=0)]
+        ids += jobs.submit_batch([((0.01,), 100), ((0.01,), 1)], limit=3)
+        for job_id, cost in zip(ids[1:], [100, 1]):
+            jobs.future(job_id).add_done_callback(lambda _, cost=cost: order.append(cost))
+        assert jobs.queued() == 3
+        with pytest.raises(Rejected):
+            jobs.submit(0.01, limit=3)
+        for job_id in ids:
+            jobs.future(job_id).result(timeout=30.0)
+    finally:
+        jobs.shutdown()
+    assert order == [1, 100]
+
+
+def exit_or_echo(x):
+    # kills the worker process running it for None
+    if x is None:
+        os._exit(1)
+    return x
+
+
+def test_job_pool_restart():
+    jobs = JobQueue(exit_or_echo, workers=1)
+    try:
+        lost = jobs.submit(None)
+        with pytest.raises(BrokenProcessPool):
+            jobs.future(lost).result(timeout=30.0)
+        # the broken pool is replaced for the next jobs
+        job_id = jobs.submit(3)
+        assert jobs.future(job_id).result(timeout=30.0) == 3
+    finally:
+        jobs.shutdown()
+
+
+def test_warm_up():
+    warm_up()
+    assert load_table.cache_info().currsize >= 6
+    misses = load_table.cache_info().misses
+
+    client = app.test_client()
+    d = make_yd41()
+    d["tws_range"] = [5.0]
+    headers = {"content-type": "application/json"}
+    response = client.post("/api/vpp/", data=json.dumps(d), headers=headers)
+    assert response.status_code == 200
+    # no table is read again
+    assert load_table.cache_info().misses == misses
+
+
+def test_metrics():
+    d = make_yd41()
+    d["tws_range"] = [7.0]
+    headers = {"content-type": "application/json"}
+    client = app.test_client()
+    client.post("/api/vpp/", data=json.dumps(d), headers=headers)
+    client.post("/api/vpp/", data=json.dumps(d), headers=headers)
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    samples = {}
+    for line in response.data.decode().splitlines():
+        if not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+
+    assert samples['vpp_requests_total{endpoint="/api/vpp/",status="200"}'] >= 2
+    assert samples['vpp_solve_seconds_bucket{points="100",le="+Inf"}'] >= 1
+    assert samples["vpp_points_solved_total"] >= 1
+    assert samples["vpp_cache_hits_total"] >= 1
+    assert 0.0 < samples["vpp_cache_hit_ratio"] <= 1.0
+    assert "vpp_convergence_failures_total" in samples
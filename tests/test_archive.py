@@ -0,0 +1,34 @@
+import numpy as np
+
+from src.ArchiveMod import ResultsArchive
+from src.UtilsMod import VPPResults
+from tests.test_utils import return_YD41_vpp
+
+
+def test_archive_round_trip(tmp_path):
+    vpp = return_YD41_vpp()
+
+    archive = ResultsArchive(str(tmp_path))
+    key = archive.add(vpp)
+    assert archive.add(vpp) == key and len(archive) == 1
+
+    # index survives re-opening the archive
+    archive = ResultsArchive(str(tmp_path))
+    assert archive.find(name="YD41") == [key]
+    assert archive.find(fingerprint=vpp.yacht.fingerprint) == [key]
+    assert archive.find(name="YD42") == []
+    assert archive.results(key) == vpp.results()
+
+    res = VPPResults.from_archive(archive, key)
+    assert isinstance(res.store, np.memmap)
+    np.testing.assert_array_equal(res.store, vpp.store)
+    np.testing.assert_array_equal(res.tws_range, vpp.tws_range)
+
+
+def test_results_json(tmp_path):
+    vpp = return_YD41_vpp()
+    vpp.write(str(tmp_path / "results"))
+
+    res = VPPResults(str(tmp_path / "results"))
+    assert res.sail_name == vpp.sail_name
+    np.testing.assert_array_equal(res.store, vpp.store)
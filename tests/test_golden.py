@@ -0,0 +1,18 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize("mode", ["grid", "points"])
+def test_golden_polar(mode):
+    # the solution paths reproduce the golden polars within tolerance
+    res = subprocess.run(
+        [sys.executable, "benchmark/golden.py", "check", "--mode", mode],
+        cwd=root, capture_output=True, text=True,
+    )
+    assert res.returncode == 0, res.stdout
+    assert "Passed." in res.stdout
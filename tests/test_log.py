@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from src.LogMod import PerformanceAnalysis, read_csv_chunks
+from tests.test_utils import return_YD41_vpp
+
+
+@pytest.fixture(scope="module")
+def analysis():
+    vpp = return_YD41_vpp(tws=[6.0, 8.0, 10.0], twa=np.linspace(40.0, 180.0, 6))
+    return PerformanceAnalysis.from_results(vpp)
+
+
+def make_log(analysis, n=1000, seed=0):
+    rng = np.random.default_rng(seed)
+    tws = rng.uniform(6.0, 10.0, n)
+    twa = rng.uniform(-180.0, 180.0, n)
+    bsp = analysis.polar.speed(tws, np.abs(twa)) * rng.uniform(0.8, 1.0, n)
+    return tws, twa, bsp
+
+
+def test_log_analysis(analysis):
+    tws, twa, bsp = make_log(analysis)
+    res = analysis.analyse(tws, twa, bsp)
+    assert np.all((res["bsp_pct"] >= 80.0 - 1e-9) & (res["bsp_pct"] <= 100.0 + 1e-9))
+
+    # port and starboard tacks are the same
+    np.testing.assert_array_equal(analysis.analyse(tws, -twa, bsp)["bsp_pct"], res["bsp_pct"])
+
+    # sailing at the target is 100 % of the target VMG, up to the tabulation
+    twa_up, vb_up, _ = analysis.targets(tws, True)
+    np.testing.assert_allclose(analysis.analyse(tws, twa_up, vb_up)["vmg_pct"], 100.0, rtol=1e-4)
+
+    chunked = analysis.analyse_array(tws, twa, bsp, chunk=64)
+    for key in res:
+        np.testing.assert_allclose(chunked[key], res[key])
+
+
+def test_log_csv(analysis, tmp_path):
+    tws, twa, bsp = make_log(analysis)
+    fname, out = str(tmp_path / "log.csv"), str(tmp_path / "out.csv")
+    np.savetxt(fname, np.column_stack([np.arange(len(tws)), bsp, tws, twa]),
+               delimiter=",", header="Time,BSP,TWS,TWA", comments="")
+
+    assert sum(len(c) for c in read_csv_chunks(fname, chunk=300)) == len(tws)
+    summary = analysis.analyse_csv(fname, out=out, chunk=300)
+    res = analysis.analyse(tws, twa, bsp)
+    assert summary["samples"] == len(tws)
+    assert summary["bsp_pct"] == pytest.approx(np.mean(res["bsp_pct"]))
+    assert summary["vmg_pct"] == pytest.approx(np.mean(res["vmg_pct"]))
+    assert np.loadtxt(out, delimiter=",", skiprows=1).shape == (len(tws), 9)
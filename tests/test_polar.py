@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from src.PolarMod import Polar
+from src.UtilsMod import KNOTS_TO_MPS
+from tests.test_utils import return_YD41_vpp, return_reach_store
+
+
+@pytest.fixture(scope="module")
+def vpp():
+    return return_YD41_vpp(tws=[6.0, 8.0, 10.0], twa=np.linspace(40.0, 180.0, 6))
+
+
+def test_polar_envelope(vpp):
+    polar = Polar.from_results(vpp)
+    assert polar.name == "YD41" and polar.sails == vpp.sail_name
+
+    # the splines interpolate the envelope of the sail sets
+    TWS, TWA = np.meshgrid(vpp.tws_range / KNOTS_TO_MPS, vpp.twa_range, indexing="ij")
+    np.testing.assert_allclose(polar.speed(TWS, TWA), vpp.store[..., 0].max(-1), atol=1e-8)
+    np.testing.assert_array_equal(polar.best_sail(TWS, TWA), vpp.store[..., 0].argmax(-1))
+    assert np.ndim(polar.heel(7.0, 95.0)) == 0
+
+
+def test_polar_gradients(vpp):
+    polar = Polar.from_results(vpp)
+    tws, twa, h = np.array([7.0, 9.0]), np.array([70.0, 130.0]), 1e-4
+    for query in [polar.speed, polar.heel, polar.leeway, polar.vmg]:
+        _, d_tws, d_twa = query(tws, twa, grad=True)
+        fd_tws = (query(tws + h, twa) - query(tws - h, twa)) / (2 * h)
+        fd_twa = (query(tws, twa + h) - query(tws, twa - h)) / (2 * h)
+        np.testing.assert_allclose(d_tws, fd_tws, rtol=1e-4, atol=1e-6)
+        np.testing.assert_allclose(d_twa, fd_twa, rtol=1e-4, atol=1e-6)
+
+
+def test_vmg_target(vpp):
+    polar = Polar.from_results(vpp)
+    tws = np.array([6.0, 9.0])
+    angles = np.linspace(40.0, 180.0, 1401)
+    for upwind, sign in [(True, 1.0), (False, -1.0)]:
+        twa, vb, vmg = polar.vmg_target(tws, upwind=upwind)
+        np.testing.assert_allclose(vb, polar.speed(tws, twa))
+        for k in range(len(tws)):
+            best = np.max(sign * polar.vmg(tws[k], angles))
+            assert sign * vmg[k] >= best - 1e-6
+
+
+@pytest.mark.parametrize("ntws, ntwa", [(2, 3), (3, 2), (4, 3)])
+def test_small_grid(ntws, ntwa):
+    # splines of degree below 3 fall back to differences for the derivatives
+    tws, twa = np.linspace(4.0, 12.0, ntws), np.linspace(45.0, 150.0, ntwa)
+    polar = Polar(tws, twa, return_reach_store(tws, twa))
+
+    vb, d_tws, d_twa = polar.speed(np.array([6.0, 10.0]), np.array([60.0, 120.0]), grad=True)
+    assert np.all(np.isfinite(d_tws)) and np.all(np.isfinite(d_twa))
+    for upwind in [True, False]:
+        twa_t, vb_t, vmg_t = polar.vmg_target(tws, upwind=upwind)
+        assert np.all((twa_t >= twa[0]) & (twa_t <= twa[-1]))
+        np.testing.assert_allclose(vb_t, polar.speed(tws, twa_t))
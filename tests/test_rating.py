@@ -0,0 +1,49 @@
+import numpy as np
+
+from src.PolarMod import Polar
+from src.RatingMod import COURSES, coastal, time_allowances
+from src.UtilsMod import KNOTS_TO_MPS
+from tests.test_utils import return_reach_store
+
+
+def make_results(name, scale=1.0):
+    # results of VPP.results(), a single sail set faster on a reach
+    tws, twa = np.array([4.0, 10.0, 16.0, 22.0]), np.linspace(40.0, 180.0, 15)
+    store = return_reach_store(tws, twa, scale, nvar=5)
+    return {
+        "name": name,
+        "tws": (tws * KNOTS_TO_MPS).tolist(),
+        "twa": twa.tolist(),
+        "sails": ["MN1 + J1"],
+        "results": store.tolist(),
+    }
+
+
+def test_time_allowances():
+    fleet = [make_results("fast"), make_results("slow", 0.9)]
+    courses = dict(COURSES, reach=coastal([(90.0, 1.0)]))
+    tws = np.array([6.0, 10.0, 16.0])
+    res = time_allowances(fleet, courses, tws=tws)
+    assert res["names"] == ["fast", "slow"]
+    assert res["allowances"].shape == (2, 3, 3)
+
+    polar = Polar(tws=[4.0, 10.0, 16.0, 22.0], twa=np.linspace(40.0, 180.0, 15),
+                  store=np.array(fleet[0]["results"]))
+    _, _, vmg_up = polar.vmg_target(tws, upwind=True)
+    _, _, vmg_dn = polar.vmg_target(tws, upwind=False)
+    wl = 3600.0 * (0.5 / vmg_up - 0.5 / vmg_dn)
+    np.testing.assert_allclose(res["allowances"][0, 0], wl)
+    np.testing.assert_allclose(res["allowances"][0, 2], 3600.0 / polar.speed(tws, 90.0))
+
+    # a slower boat gets more time on every course, in proportion
+    np.testing.assert_allclose(res["allowances"][1], res["allowances"][0] / 0.9)
+    # random legs are faster than beating and running
+    assert np.all(res["allowances"][:, 1] < res["allowances"][:, 0])
+
+
+def test_api_results():
+    # the small grid of the API sample, 2 TWS and 3 TWA
+    from src import api
+
+    rating = time_allowances([api.solve(api.YD41)])
+    assert np.all(np.isfinite(rating["allowances"])) and np.all(rating["allowances"] > 0.0)
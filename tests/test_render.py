@@ -0,0 +1,22 @@
+import os
+
+import matplotlib
+import numpy as np
+
+from src.ArchiveMod import ResultsArchive
+from src.RenderMod import render_archive
+from tests.test_utils import return_YD41_vpp
+
+
+def test_render_archive(tmp_path):
+    vpp = return_YD41_vpp(tws=[6.0, 10.0], twa=np.linspace(40.0, 180.0, 8))
+    archive = ResultsArchive(str(tmp_path / "archive"))
+    key = archive.add(vpp)
+
+    out = str(tmp_path / "figures")
+    backend = matplotlib.get_backend()
+    files = render_archive(str(tmp_path / "archive"), out, n=3, size=(8.0, 4.0), dpi=50, workers=1)
+    assert sorted(os.path.basename(f) for f in files) == [key + "_polar.png", key + "_sails.png"]
+    assert all(os.path.getsize(f) > 0 for f in files)
+    # the backend of the user is left alone
+    assert matplotlib.get_backend() == backend
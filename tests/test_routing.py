@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from src.PolarMod import Polar
+from src.RoutingMod import Router, WindField, bearing, distance, route_ensemble
+from src.UtilsMod import KNOTS_TO_MPS
+from tests.test_utils import return_reach_store
+
+
+@pytest.fixture(scope="module")
+def polar():
+    # a single sail set, faster on a reach
+    tws, twa = np.array([4.0, 10.0, 16.0, 22.0]), np.linspace(40.0, 180.0, 15)
+    return Polar(tws, twa, return_reach_store(tws, twa))
+
+
+def uniform_wind(tws, twd):
+    time, lat, lon = np.array([0.0, 240.0]), np.arange(40.0, 56.0), np.arange(-30.0, 1.0)
+    shape = (len(time), len(lat), len(lon))
+    u = np.full(shape, -tws * KNOTS_TO_MPS * np.sin(np.radians(twd)))
+    v = np.full(shape, -tws * KNOTS_TO_MPS * np.cos(np.radians(twd)))
+    return WindField(time, lat, lon, u, v)
+
+
+def test_wind_field(tmp_path):
+    wind = uniform_wind(12.0, 225.0)
+    tws, twd = wind.at(np.array([0.0, 100.0]), np.array([45.0, 50.5]), np.array([-20.0, -3.2]))
+    np.testing.assert_allclose(tws, 12.0)
+    np.testing.assert_allclose(twd, 225.0)
+
+    wind.save(str(tmp_path / "wind.npz"))
+    np.testing.assert_array_equal(WindField.load(str(tmp_path / "wind.npz")).u, wind.u)
+
+
+def test_route_reach(polar):
+    # northerly wind, the destination is due east on a beam reach
+    start, end = (45.0, -20.0), (45.0, -15.0)
+    route = Router(polar, uniform_wind(10.0, 0.0)).route(start, end)
+    direct = distance(start[0], start[1], end[0], end[1]) / polar.speed(10.0, 90.0)
+    assert route["eta"] == pytest.approx(direct, rel=0.02)
+    assert route["lat"][0] == start[0] and route["lat"][-1] == end[0]
+    # one leg to each point, the last one at the speed of the ETA
+    assert len(route["bsp"]) == len(route["heading"]) == len(route["lat"]) - 1
+    lat, lon = route["lat"][-2], route["lon"][-2]
+    assert route["heading"][-1] == pytest.approx(bearing(lat, lon, end[0], end[1]))
+    last = distance(lat, lon, end[0], end[1])
+    assert last / route["bsp"][-1] == pytest.approx(route["time"][-1] - route["time"][-2])
+
+
+def test_route_upwind(polar):
+    # the destination is dead upwind, the route tacks at the VMG target
+    start, end = (45.0, -20.0), (50.0, -20.0)
+    route = Router(polar, uniform_wind(10.0, 0.0)).route(start, end)
+    _, _, vmg = polar.vmg_target(10.0)
+    best = distance(start[0], start[1], end[0], end[1]) / vmg[0]
+    assert route["eta"] == pytest.approx(best, rel=0.03)
+    assert np.all(np.array(route["twa"]) >= 40.0)
+
+
+def test_route_ensemble(polar, tmp_path):
+    fnames = []
+    for k, twd in enumerate([0.0, 90.0]):
+        fnames.append(str(tmp_path / ("member%d.npz" % k)))
+        uniform_wind(10.0, twd).save(fnames[-1])
+    routes = route_ensemble(polar, fnames, (45.0, -20.0), (45.0, -15.0), workers=1)
+    assert routes[0]["eta"] < routes[1]["eta"] # a reach beats a beat
+    assert route_ensemble(polar, fnames, (45.0, -20.0), (45.0, -15.0), workers=2) == routes
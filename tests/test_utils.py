@@ -1,4 +1,8 @@
+import numpy as np
+
 from src.SailMod import Jib, Kite, Main
+from src.UtilsMod import sail_crossovers, sail_regions
+from src.VPPMod import VPP
 from src.YachtMod import Keel, Rudder, Yacht
 
 def return_YD41_particulars():
@@ -25,4 +29,40 @@ def return_YD41_particulars():
             Kite("A5", area=75.0, vce=2.75),
         ],
     )
-    return YD41
\ No newline at end of file
+    return YD41
+
+
+def return_YD41_vpp(tws=(6.0,), twa=(30.0, 105.0, 180.0), run=True, **kwargs):
+    # a small analysis of the YD41, kwargs are passed to set_analysis
+    vpp = VPP(Yacht=return_YD41_particulars())
+    vpp.set_analysis(tws_range=np.array(tws), twa_range=np.array(twa), **kwargs)
+    if run:
+        vpp.run()
+    return vpp
+
+
+def return_reach_store(
+    tws=(4.0, 10.0, 16.0, 22.0), twa=np.linspace(40.0, 180.0, 15), scale=1.0, nvar=3
+):
+    # synthetic store of a single sail set, faster on a reach
+    tws, twa = np.asarray(tws), np.asarray(twa)
+    store = np.zeros((len(tws), len(twa), 1, nvar))
+    store[..., 0, 0] = scale * np.sqrt(tws)[:, None] * (2.0 + np.sin(np.radians(twa)))[None, :]
+    return store
+
+
+def test_sail_crossovers():
+    # the jib is faster below 85 + 10 * i degrees, the kite is skipped upwind
+    twa = np.linspace(40.0, 180.0, 15)
+    store = np.zeros((3, len(twa), 2, 3))
+    for i in range(3):
+        store[i, :, 0, 0] = 8.0 - 0.05 * (twa - 85.0 - 10.0 * i)
+        store[i, :, 1, 0] = np.where(twa > 60.0, 8.0 + 0.05 * (twa - 85.0 - 10.0 * i), 0.0)
+
+    best, cross = sail_crossovers(twa, store)
+    np.testing.assert_array_equal(best, store[..., 0].argmax(-1))
+    np.testing.assert_allclose(cross[~np.isnan(cross)], [85.0, 95.0, 105.0])
+
+    lo, hi = sail_regions(twa, store)
+    np.testing.assert_allclose(lo, [[40.0] * 3, [85.0, 95.0, 105.0]])
+    np.testing.assert_allclose(hi, [[85.0, 95.0, 105.0], [180.0] * 3])
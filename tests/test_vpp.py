@@ -1,8 +1,12 @@
 
+import subprocess
+import sys
+
 import numpy as np
+import pytest
 
-from tests.test_utils import return_YD41_particulars
-from src.VPPMod import VPP
+from tests.test_utils import return_YD41_particulars, return_YD41_vpp
+from src.VPPMod import FAILED, SKIPPED, UNSOLVED, VPP, BudgetExceeded
 from src.SailMod import Jib, Main
 
 def test_single_sail_set():
@@ -24,3 +28,143 @@ def test_single_sail_set():
     vpp.write("results")
     vpp.polar(3, False)
     vpp.SailChart(False)
+
+
+def test_convergence_status():
+    vpp = return_YD41_vpp()
+    assert np.all(vpp.status != UNSOLVED)
+    assert np.all(vpp.status[vpp.store[..., 0] > 0.0] < FAILED)
+
+    # starve the solver, failed points must not leak into the results
+    vpp.max_nfev = 1
+    vpp.backend = "lm"
+    vpp.run()
+    solved = vpp.status != SKIPPED
+    assert np.all(vpp.status[solved] == FAILED)
+    assert np.all(vpp.store[solved] == 0.0)
+
+
+def test_iter_run():
+    vpp = return_YD41_vpp(run=False)
+    points = list(vpp.iter_run())
+    assert len(points) == np.sum(vpp.status != SKIPPED)
+    for point in points:
+        i, j, n = point["index"]
+        assert point["sail"] == vpp.sail_name[n]
+        assert point["state"] == vpp.store[i, j, n, :3].tolist()
+        assert point["diagnostics"]["status"] == vpp.status[i, j, n]
+
+    # stopping early leaves the remaining points unsolved
+    vpp = return_YD41_vpp(run=False)
+    stream = vpp.iter_run()
+    next(stream)
+    stream.close()
+    assert np.sum(vpp.status == UNSOLVED) > 0
+
+
+def test_solve_points():
+    vpp = return_YD41_vpp(tws=[6.0, 8.0], twa=[45.0, 90.0, 150.0])
+
+    tws = np.array([8.0, 6.0, 8.0])
+    twa = np.array([90.0, 45.0, 150.0])
+    res = vpp.solve_points(tws, twa)
+    assert res.shape == (3, vpp.Nsails, 3)
+    np.testing.assert_allclose(res[0], vpp.store[1, 1, :, :3], atol=1e-3)
+    np.testing.assert_allclose(res[1], vpp.store[0, 0, :, :3], atol=1e-3)
+    np.testing.assert_allclose(res[2], vpp.store[1, 2, :, :3], atol=1e-3)
+
+    # repeated queries are memoized
+    memo = len(vpp._memo)
+    np.testing.assert_array_equal(vpp.solve_points(tws[::-1], twa[::-1]), res[::-1])
+    assert len(vpp._memo) == memo
+
+    # solved from the initial guess like the grid, same convergence status
+    for (i, j), (t, a) in zip([(1, 1), (0, 0), (1, 2)], zip(tws, twa)):
+        for n in range(vpp.Nsails):
+            assert vpp._memo[(t, a, n)][1] == vpp.status[i, j, n]
+
+    # the memo is cleared once full
+    vpp.memo_size = 2
+    vpp.solve_points(7.0, 60.0)
+    assert len(vpp._memo) <= 2
+
+
+def test_checkpoint_resume(tmp_path):
+    fname = str(tmp_path / "run.npz")
+    vpp = return_YD41_vpp(run=False)
+
+    # interrupted run, checkpointed when the generator is closed
+    stream = vpp.iter_run(checkpoint=fname)
+    next(stream)
+    next(stream)
+    stream.close()
+
+    vpp = return_YD41_vpp(run=False)
+    points = list(vpp.iter_run(checkpoint=fname, resume=True))
+    assert len(points) == np.sum(vpp.status != SKIPPED) - 2
+    assert np.all(vpp.status != UNSOLVED)
+
+    full = return_YD41_vpp()
+    np.testing.assert_allclose(vpp.store, full.store)
+
+    # points between two checkpoints
+    with pytest.raises(ValueError):
+        vpp.run(checkpoint=fname, every=0)
+    with pytest.raises(ValueError):
+        next(vpp.iter_run(checkpoint=fname, every=0))
+
+    # a run stopped by its budget is also checkpointed
+    vpp = return_YD41_vpp(run=False)
+    vpp.nfev_budget = 1
+    with pytest.raises(BudgetExceeded):
+        vpp.run(checkpoint=fname)
+    with np.load(fname) as data:
+        assert np.sum(data["status"] != UNSOLVED) >= 1
+        np.testing.assert_array_equal(data["store"], vpp.store)
+
+
+def test_memory_mapped_store(tmp_path):
+    fname = str(tmp_path / "store.npy")
+    vpp = return_YD41_vpp(run=False, fname=fname, chunk=2)
+    assert isinstance(vpp.store, np.memmap)
+    vpp.run()
+
+    store = VPP.open_store(fname)
+    assert isinstance(store, np.memmap)
+    np.testing.assert_array_equal(store, vpp.store)
+    assert np.all(store[vpp.status < SKIPPED][..., 0] > 0.0)
+
+
+def test_memory_mapped_rss(tmp_path):
+    # a large grid with a trivial solver, only the store size matters
+    code = """
+import resource
+import numpy as np
+from src.VPPMod import CONVERGED
+from tests.test_utils import return_YD41_vpp
+
+tws, twa = np.linspace(4.0, 20.0, 50), np.linspace(30.0, 180.0, 1000)
+vpp = return_YD41_vpp(tws, twa, run=False, fname=%r)
+vpp._initial_guess = lambda tws, twa: (1.0, 0.0, 0.0)
+vpp._solve_point = lambda x0, twa, tws, neighbour=None: (np.array(x0), CONVERGED, 1)
+vpp.resid = lambda x0, twa, tws: [0.0, 0.0, 0.0]
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+vpp.run()
+vpp.write(%r)
+print(vpp.store.nbytes // 1024, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before)
+""" % (str(tmp_path / "store.npy"), str(tmp_path / "results"))
+    res = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    size, growth = map(int, res.stdout.split())
+    assert growth < size / 4
+
+
+def test_lazy_imports():
+    code = "import sys, src.VPPMod; print(sorted(set(sys.modules) & {%s}))" % (
+        ", ".join('"%s"' % m for m in ["matplotlib", "nlopt", "tqdm"])
+    )
+    res = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert res.stdout.strip() == "[]"